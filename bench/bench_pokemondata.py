@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""Time each PokemonData classification phase on synthetic inventories.
+
+Every PokemonData.set_* method is timed separately, whatever init_all
+does between them is reported as "inline". Peak memory is measured with
+tracemalloc. Results are compared against bench/baselines/pokemondata.json,
+pass --save to record new baselines.
+
+    python bench/bench_pokemondata.py --sizes 100 1000 10000 100000
+    python bench/bench_pokemondata.py --sizes 1000000 --phases
+    python bench/bench_pokemondata.py --columns
+
+--columns times the numpy PokemonColumns backend instead, its baselines
+are kept under "columns/<size>". --optimize turns on the candy-aware
+evolution optimizer (optimizer.py), baselines under "optimize/<size>".
+"""
+import os
+import sys
+import csv
+import json
+import time
+import bisect
+import random
+import argparse
+import platform
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'pogo'))
+import POGOProtos
+from POGOProtos.Data import PokemonData_pb2
+
+import pokemondata
+import pokemoncolumns
+from pokemondata import PokemonData
+from species import Species
+
+BASELINES = os.path.join(ROOT, 'bench', 'baselines', 'pokemondata.json')
+
+
+def load_tables():
+    tables = []
+    for name in ['names.tsv', 'families.tsv', 'evolves.tsv']:
+        with open(os.path.join(ROOT, name)) as f:
+            f.readline()
+            tables.append(dict(csv.reader(f, delimiter='\t')))
+    return tables
+
+
+def make_config(**kwargs):
+    config = {
+        "hard_minimum": False,
+        "minimumIV": "80",
+        "cp_override": None,
+        "force": False,
+        "white_list": None,
+        "black_list": None
+    }
+    config.update(kwargs)
+    return config
+
+
+def generate(size, family, seed=0):
+    """Synthetic party and candies, a few species make up most of it"""
+    rng = random.Random(seed)
+    numbers = sorted(int(x) for x in family)
+    rng.shuffle(numbers)
+    cumulative = []
+    total = 0.0
+    for rank in range(len(numbers)):
+        total += 1.0 / (rank + 1)
+        cumulative.append(total)
+
+    party = []
+    for i in range(size):
+        party.append(PokemonData_pb2.PokemonData(
+            id=i + 1,
+            pokemon_id=numbers[bisect.bisect(cumulative, rng.random() * total)],
+            cp=rng.randint(10, 2500),
+            individual_attack=rng.randint(0, 15),
+            individual_defense=rng.randint(0, 15),
+            individual_stamina=rng.randint(0, 15)
+        ))
+    candies = dict((int(f), rng.randint(0, 400)) for f in set(family.values()))
+    return party, candies
+
+
+class PhaseTimer(object):
+    """Wraps every set_* method of PokemonData to time it"""
+
+    def __init__(self):
+        self.times = {}
+        self.originals = {}
+
+    def __enter__(self):
+        for name in dir(PokemonData):
+            if name.startswith('set_') and callable(getattr(PokemonData, name)):
+                self.originals[name] = getattr(PokemonData, name)
+                setattr(PokemonData, name, self.wrap(name, self.originals[name]))
+        return self
+
+    def __exit__(self, *args):
+        for name, method in self.originals.items():
+            setattr(PokemonData, name, method)
+
+    def wrap(self, name, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+        return timed
+
+
+def run_columns(size, tables, config):
+    pokedex, family, cost = tables
+    species = Species.from_dicts(pokedex, family, cost)
+    party, candies = generate(size, family)
+
+    result = {}
+    start = time.perf_counter()
+    pokemoncolumns.PokemonColumns(party, candies, species, config=config)
+    result["total"] = time.perf_counter() - start
+
+    tracemalloc.start()
+    data = pokemoncolumns.PokemonColumns(party, candies, species, config=config)
+    result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1048576.0
+    tracemalloc.stop()
+    del data
+    return result
+
+
+def run(size, tables, config, phases=False):
+    pokedex, family, cost = tables
+    species = Species.from_dicts(pokedex, family, cost)
+    party, candies = generate(size, family)
+
+    result = {}
+    with PhaseTimer() as timer:
+        start = time.perf_counter()
+        PokemonData(party, candies, species, config=config)
+        result["total"] = time.perf_counter() - start
+    if phases:
+        result["phases"] = timer.times
+        result["phases"]["inline"] = result["total"] - sum(timer.times.values())
+
+    # Memory is measured on a separate run, tracemalloc slows everything down
+    tracemalloc.start()
+    data = PokemonData(party, candies, species, config=config)
+    result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1048576.0
+    tracemalloc.stop()
+    del data
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", help="inventory sizes", type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument("--phases", help="print the time of every phase", action="store_true")
+    parser.add_argument("--save", help="record the results as the new baselines", action="store_true")
+    parser.add_argument("--columns", help="time the numpy columnar backend", action="store_true")
+    parser.add_argument("--optimize", help="with the evolution optimizer", action="store_true")
+    parser.add_argument("--tolerance", help="slowdown over baseline that counts as a regression", type=float, default=1.5)
+    args = parser.parse_args()
+    if args.columns and pokemoncolumns.np is None:
+        parser.error("--columns needs numpy")
+    if args.columns and args.optimize:
+        parser.error("the optimizer only runs in PokemonData, use --columns or --optimize")
+
+    tables = load_tables()
+    config = make_config(optimize=args.optimize, max_evolutions="71")
+    baselines = {}
+    if os.path.isfile(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f).get("results", {})
+
+    results = {}
+    regressions = []
+    print('{0:>10} {1:>12} {2:>12} {3:>12} {4:>10}'.format('[size]', '[total s]', '[baseline s]', '[peak MB]', '[ratio]'))
+    for size in args.sizes:
+        if args.columns:
+            key = 'columns/{0}'.format(size)
+            r = run_columns(size, tables, config)
+        elif args.optimize:
+            key = 'optimize/{0}'.format(size)
+            r = run(size, tables, config, args.phases)
+        else:
+            key = str(size)
+            r = run(size, tables, config, args.phases)
+        results[key] = r
+        base = baselines.get(key)
+        ratio = r["total"] / base["total"] if base else float('nan')
+        print('{0:>10} {1:>12.4f} {2:>12} {3:>12.1f} {4:>10.2f}'.format(
+            size, r["total"], '{0:.4f}'.format(base["total"]) if base else '-', r["peak_mb"], ratio))
+        if args.phases and "phases" in r:
+            for name, t in sorted(r["phases"].items(), key=lambda x: -x[1]):
+                print('{0:>24} {1:>12.4f}'.format(name, t))
+        if base and ratio > args.tolerance:
+            regressions.append(size)
+
+    if args.save:
+        baselines.update(results)
+        if not os.path.isdir(os.path.dirname(BASELINES)):
+            os.makedirs(os.path.dirname(BASELINES))
+        with open(BASELINES, 'w') as f:
+            json.dump({
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "module": os.path.basename(pokemondata.__file__),
+                "results": baselines
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if regressions:
+        print('Regression over {0}x baseline for sizes: {1}'.format(args.tolerance, regressions))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Compare the per-file generated protos with the descriptor bundle.
+
+Every run is a fresh interpreter with POGO_PROTOS set to "files" or
+"bundle". Two workloads:
+
+    pokeiv  the client and the State fields pokeIV.py uses
+    all     every generated module and one instance of every message
+
+Reported are the median load time and the resident memory the load
+added (max RSS after minus before). Build the bundle first with
+./compile.sh bundle.
+
+    python bench/bench_protos.py --runs 9
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+POGO = os.path.join(ROOT, 'pogo')
+
+WORKLOADS = {
+    'pokeiv': '''
+import POGOProtos
+import api
+import session
+import state
+s = state.State()
+s.inventory, s.release, s.evolve
+''',
+    'all': '''
+import POGOProtos
+import protos
+import importlib
+for directory, _, filenames in os.walk(os.path.join(POGO, 'POGOProtos')):
+    for filename in filenames:
+        if filename.endswith('_pb2.py'):
+            name = os.path.relpath(os.path.join(directory, filename[:-3]), POGO).replace(os.sep, '.')
+            module = importlib.import_module(name)
+            for message in module.DESCRIPTOR.message_types_by_name:
+                getattr(module, message)()
+'''
+}
+
+RUN = '''
+import os
+import sys
+import json
+import time
+import resource
+POGO = {pogo!r}
+sys.path.insert(0, os.path.dirname(POGO))
+sys.path.insert(0, POGO)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+{workload}
+seconds = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": seconds, "rss_kb": after - before}}))
+'''
+
+
+def run(mode, workload):
+    env = dict(os.environ, POGO_PROTOS=mode)
+    code = RUN.format(pogo=os.path.realpath(POGO), workload=WORKLOADS[workload])
+    out = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT, env=env)
+    return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="cold starts per mode and workload", type=int, default=5)
+    parser.add_argument("--workloads", help="workloads to run", nargs='+', default=sorted(WORKLOADS), choices=sorted(WORKLOADS))
+    args = parser.parse_args()
+
+    if not os.path.isfile(os.path.join(POGO, 'POGOProtos.desc')):
+        parser.error('no bundle, run ./compile.sh bundle first')
+
+    print('{0:>10} {1:>8} {2:>10} {3:>10}'.format('[workload]', '[mode]', '[load s]', '[rss MB]'))
+    for workload in args.workloads:
+        for mode in ['files', 'bundle']:
+            results = [run(mode, workload) for _ in range(args.runs)]
+            print('{0:>10} {1:>8} {2:>10.4f} {3:>10.1f}'.format(
+                workload,
+                mode,
+                median([r["seconds"] for r in results]),
+                median([r["rss_kb"] for r in results]) / 1024.0
+            ))
+
+if __name__ == '__main__':
+    main()
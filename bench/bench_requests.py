@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Compare bytes and client parse time per call for different request policies.
+
+Runs a release loop against the local stand-in server (pogo/standin.py),
+once with the default policy (all four defaults on every call) and once
+with RequestPolicy.lean().
+
+    python bench/bench_requests.py -n 200 --party 1000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'pogo'))
+import POGOProtos
+from cache import SettingsCache
+from policy import RequestPolicy
+from standin import StandInPlayer, StandInHandler, StandInServer, createSession
+
+
+def run(policy, calls, party):
+    handler = StandInHandler(StandInPlayer.generate(party))
+    server = StandInServer(handler).start()
+    cache = tempfile.mkdtemp()
+    try:
+        session = createSession(server, cache=SettingsCache(cache))
+        session.setRequestPolicy(policy)
+        return releaseAll(session, handler, calls)
+    finally:
+        server.stop()
+        shutil.rmtree(cache)
+
+
+def releaseAll(session, handler, calls):
+    # Time spent parsing the defaults on the client
+    parseTime = [0.0]
+    parseDefault = session.parseDefault
+
+    def timedParseDefault(*args):
+        start = time.time()
+        parseDefault(*args)
+        parseTime[0] += time.time() - start
+    session.parseDefault = timedParseDefault
+
+    pokemon = list(session.inventory["party"])[:calls]
+    handler.bytesReceived = handler.bytesSent = 0
+    start = time.time()
+    for p in pokemon:
+        session.releasePokemon(p)
+    total = time.time() - start
+
+    n = float(len(pokemon))
+    return {
+        'sent': handler.bytesReceived / n,
+        'received': handler.bytesSent / n,
+        'parse': parseTime[0] / n * 1000,
+        'total': total / n * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--calls", help="number of releases", type=int, default=200)
+    parser.add_argument("--party", help="pokemon in the stand-in inventory", type=int, default=1000)
+    parser.add_argument("--every", help="inventory every N calls for the lean policy", type=int, default=10)
+    args = parser.parse_args()
+
+    print('{0:<10} {1:>12} {2:>12} {3:>12} {4:>12}'.format('[policy]', '[sent B]', '[recv B]', '[parse ms]', '[call ms]'))
+    for name, policy in [('default', RequestPolicy()), ('lean', RequestPolicy.lean(args.every))]:
+        r = run(policy, args.calls, args.party)
+        print('{0:<10} {1:>12.0f} {2:>12.0f} {3:>12.3f} {4:>12.3f}'.format(name, r['sent'], r['received'], r['parse'], r['total']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""Wall time of a transfer and evolve pass, sleep loops against the scheduler.
+
+Runs pokeIV's transfer and evolve functions against the local stand-in
+(pogo/standin.py) on a simulated clock, so the delays cost nothing to
+run. "sequential" is what the sleep loops did: every transfer then every
+evolve, each followed by its delay. "scheduled" is one Scheduler with a
+queue per action type. The smallest gap between two actions of the same
+type is reported to show neither queue goes over its rate.
+
+    python bench/bench_scheduler.py --transfers 150 --evolves 70
+"""
+import os
+import sys
+import shutil
+import logging
+import argparse
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'pogo'))
+sys.path.insert(0, ROOT)
+import POGOProtos
+from standin import StandInPlayer, StandInHandler, createSession
+from scheduler import Scheduler
+from pokemondata import Pokemon
+from cache import SettingsCache
+import pokeIV
+
+
+class Clock(object):
+    """Simulated time, sleeping moves it forward"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+
+class Recorder(object):
+    """Passes calls on to the session and notes when they were made"""
+
+    def __init__(self, session, clock):
+        self.session = session
+        self.clock = clock
+        self.times = {'transfer': [], 'evolve': []}
+
+    def releasePokemonBatch(self, *args):
+        self.times['transfer'].append(self.clock())
+        return self.session.releasePokemonBatch(*args)
+
+    def evolvePokemonBatch(self, *args):
+        self.times['evolve'].append(self.clock())
+        return self.session.evolvePokemonBatch(*args)
+
+
+def makeData(session, transfers, evolves, config):
+    # The stand-in's party, split into the lists pokeIV works through
+    party = []
+    for p in session.inventory["party"]:
+        pokemon = Pokemon()
+        pokemon.id, pokemon.number, pokemon.name, pokemon.cp, pokemon.iv = p.id, p.pokemon_id, str(p.pokemon_id), p.cp, 0.0
+        party.append(pokemon)
+    return {
+        "config": config,
+        "transfer": party[:transfers],
+        "evolve": party[transfers:transfers + evolves],
+        "all": list(party),
+        "extra": [],
+        "unique_counts": dict((str(p.number), len(party)) for p in party),
+        "evolve_counts": dict((str(p.number), evolves) for p in party)
+    }
+
+
+def run(mode, args):
+    handler = StandInHandler(StandInPlayer.generate(args.transfers + args.evolves))
+    cache = tempfile.mkdtemp()
+    try:
+        session = createSession(handler=handler, cache=SettingsCache(cache))
+    finally:
+        shutil.rmtree(cache)
+    clock = Clock()
+    recorder = Recorder(session, clock)
+    config = argparse.Namespace(transfer=True, evolve=True, batch_size="1", jitter=str(args.jitter),
+                                transfer_delay=str(args.transfer_delay), evolution_delay=str(args.evolution_delay))
+    data = makeData(session, args.transfers, args.evolves, config)
+
+    if mode == 'sequential':
+        for p in data["transfer"][:]:
+            pokeIV.transfer_batch(data, recorder, [p])
+            clock.sleep(args.transfer_delay)
+        for p in data["evolve"][:]:
+            pokeIV.evolve_batch(data, recorder, [p])
+            clock.sleep(args.evolution_delay)
+    else:
+        scheduler = Scheduler(jitter=args.jitter, seed=0, clock=clock, sleep=clock.sleep)
+        scheduler.add_queue("transfer", args.transfer_delay)
+        scheduler.add_queue("evolve", args.evolution_delay)
+        pokeIV.transfer_pokemon(data, recorder, scheduler)
+        pokeIV.evolve_pokemon(data, recorder, scheduler)
+        scheduler.run()
+
+    gaps = dict((name, min([b - a for a, b in zip(times, times[1:])] or [0]))
+                for name, times in recorder.times.items())
+    return clock(), gaps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transfers", type=int, default=150)
+    parser.add_argument("--evolves", type=int, default=70)
+    parser.add_argument("--transfer_delay", type=float, default=10)
+    parser.add_argument("--evolution_delay", type=float, default=25)
+    parser.add_argument("--jitter", type=float, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.ERROR)
+
+    print('{0:>12} {1:>10} {2:>14} {3:>14}'.format('[mode]', '[wall s]', '[transfer gap]', '[evolve gap]'))
+    for mode in ['sequential', 'scheduled']:
+        wall, gaps = run(mode, args)
+        print('{0:>12} {1:>10.0f} {2:>14.1f} {3:>14.1f}'.format(mode, wall, gaps['transfer'], gaps['evolve']))
+
+if __name__ == '__main__':
+    main()
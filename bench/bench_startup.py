@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""Time a cold start of the pogo client, as pokeIV.py does it.
+
+Every run is a fresh interpreter with -X importtime, which imports the
+client and builds the State fields pokeIV.py uses (inventory, release
+and evolve). Import time is split by top level package, --top also lists
+the slowest single modules. --root benchmarks another checkout, to
+compare against an older revision:
+
+    git worktree add /tmp/old HEAD~1
+    python bench/bench_startup.py --root /tmp/old
+    python bench/bench_startup.py
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+BASELINES = os.path.join(ROOT, 'bench', 'baselines', 'startup.json')
+
+STARTUP = '''
+import sys
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {pogo!r})
+import POGOProtos
+import api
+import session
+import state
+s = state.State()
+s.inventory, s.release, s.evolve
+'''
+
+
+def run(root):
+    """One cold start: wall seconds and {module: (self us, cumulative us)}"""
+    root = os.path.realpath(root)
+    code = STARTUP.format(root=root, pogo=os.path.join(root, 'pogo'))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit('startup failed in {0}'.format(root))
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(own), int(cumulative))
+    return wall, modules
+
+
+def group(modules):
+    """Self import time per top level package, in seconds"""
+    packages = {}
+    for name, (own, _) in modules.items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + own / 1e6
+    return packages
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", help="checkout to benchmark", default=ROOT)
+    parser.add_argument("--runs", help="cold starts to take the median of", type=int, default=7)
+    parser.add_argument("--top", help="list the slowest modules", type=int, default=0)
+    parser.add_argument("--save", help="record the results as the new baseline", action="store_true")
+    args = parser.parse_args()
+
+    walls = []
+    imports = []
+    packages = {}
+    modules = {}
+    for _ in range(args.runs):
+        wall, modules = run(args.root)
+        walls.append(wall)
+        imports.append(sum(own for own, _ in modules.values()) / 1e6)
+        for package, seconds in group(modules).items():
+            packages.setdefault(package, []).append(seconds)
+
+    result = {
+        "wall": median(walls),
+        "imports": median(imports),
+        "modules": len(modules),
+        "pb2_modules": len([name for name in modules if name.endswith('_pb2')])
+    }
+    baseline = {}
+    if os.path.isfile(BASELINES):
+        with open(BASELINES) as f:
+            baseline = json.load(f).get("result", {})
+
+    print('{0:>14} {1:>10} {2:>10}'.format('', '[now]', '[baseline]'))
+    for key, fmt in [("wall", '{0:.3f}'), ("imports", '{0:.3f}'), ("modules", '{0}'), ("pb2_modules", '{0}')]:
+        print('{0:>14} {1:>10} {2:>10}'.format(
+            key, fmt.format(result[key]), fmt.format(baseline[key]) if key in baseline else '-'))
+
+    print('\n{0:>24} {1:>10}'.format('[package]', '[self s]'))
+    for package, seconds in sorted(packages.items(), key=lambda x: -median(x[1]))[:12]:
+        print('{0:>24} {1:>10.4f}'.format(package, median(seconds)))
+
+    if args.top:
+        print('\n{0:>60} {1:>10} {2:>10}'.format('[module]', '[self s]', '[cumul s]'))
+        for name, (own, cumulative) in sorted(modules.items(), key=lambda x: -x[1][0])[:args.top]:
+            print('{0:>60} {1:>10.4f} {2:>10.4f}'.format(name, own / 1e6, cumulative / 1e6))
+
+    if args.save:
+        if not os.path.isdir(os.path.dirname(BASELINES)):
+            os.makedirs(os.path.dirname(BASELINES))
+        with open(BASELINES, 'w') as f:
+            json.dump({
+                "machine": platform.platform(),
+                "python": platform.python_version(),
+                "result": result
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,16 @@
 #!/bin/bash
 
+# ./compile.sh bundle only writes pogo/POGOProtos.desc, all of the
+# generated protos in one descriptor set (used with POGO_PROTOS=bundle)
+if [ "$1" == "bundle" ]; then
+    cd ./pogo/
+    python protos.py
+    cd ../
+    exit
+fi
+
 rm -rf pogo/proto
 cd ./proto/
 ./compile.py -l python -o ../pogo/
 cd ../
+python pogo/protos.py
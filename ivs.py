@@ -0,0 +1,84 @@
+#IVs of pokemon the server sent without them (all three 0, the protobuf default)
+#every attack/defense/stamina combination is tried against the pokemon's CP and HP at its level
+#numpy tries all of them at once, without it the HP narrows stamina down first
+from levels import MAX_IV, calculate_cp, calculate_hp
+
+IV_VALUES = MAX_IV + 1
+
+class Inferred(object):
+    #what an inventory entry allows, ivs are the (attack, defense, stamina) that fit
+    #min, max and expected (the average of those that fit) are IV percentages,
+    #perfection is the average CP at max level against a perfect one (levels.Projection),
+    #all None if nothing fits
+    __slots__ = ("ivs", "min", "max", "expected", "perfection")
+
+    def __init__(self, ivs, projection, number):
+        self.ivs = ivs
+        if not ivs:
+            self.min = self.max = self.expected = self.perfection = None
+            return
+        percents = [(a + d + s) / float(3 * MAX_IV) * 100 for a, d, s in ivs]
+        self.min = min(percents)
+        self.max = max(percents)
+        self.expected = sum(percents) / len(percents)
+        cps = sum(projection.cp(number, a, d, s) for a, d, s in ivs)
+        self.perfection = cps * 100.0 / projection.perfect[number] / len(ivs)
+
+    def __len__(self):
+        return len(self.ivs)
+
+    #the IVs if only one combination fits
+    @property
+    def exact(self):
+        return self.ivs[0] if len(self.ivs) == 1 else None
+
+#same sums as levels.calculate_cp and calculate_hp, so the arrays agree with them
+#the HP only depends on stamina, the CP is worked out as a 16x16 grid of attack and defense
+#for each stamina that gives the right HP
+def fit_numpy(attack, defense, stamina, multiplier, cp, hp):
+    import numpy as np
+    values = np.arange(IV_VALUES, dtype=np.float64)
+    staminas = np.flatnonzero(np.maximum(10, np.floor((stamina + values) * multiplier)) == hp)
+    if not len(staminas):
+        return []
+    strength = ((attack + values)[:, None, None] * np.sqrt(defense + values)[None, :, None]
+                * np.sqrt(stamina + values[staminas])[None, None, :])
+    fits = np.nonzero(np.maximum(10, np.floor(strength * multiplier * multiplier / 10)) == cp)
+    return list(zip(fits[0].tolist(), fits[1].tolist(), staminas[fits[2]].tolist()))
+
+def fit_python(attack, defense, stamina, multiplier, cp, hp):
+    ivs = []
+    for s in range(IV_VALUES):
+        if calculate_hp(stamina + s, multiplier) != hp:
+            continue
+        for a in range(IV_VALUES):
+            for d in range(IV_VALUES):
+                if calculate_cp(attack + a, defense + d, stamina + s, multiplier) == cp:
+                    ivs.append((a, d, s))
+    return sorted(ivs)
+
+#numpy if there is numpy, looked for on first use so pokeIV starts without it
+_fit = None
+
+def fit(attack, defense, stamina, multiplier, cp, hp):
+    global _fit
+    if _fit is None:
+        try:
+            import numpy
+            _fit = fit_numpy
+        except ImportError:
+            _fit = fit_python
+    return _fit(attack, defense, stamina, multiplier, cp, hp)
+
+#projection is a levels.Projection, hp is the pokemon's stamina_max
+#None if the species has no base stats or the level isn't known
+def infer(projection, number, cp, hp, level):
+    if number not in projection or level is None:
+        return None
+    key = (number, cp, hp, level)
+    if key not in projection.inferred:
+        species = projection.species
+        ivs = fit(species.attack[number], species.defense[number], species.stamina[number],
+                  projection.levels.multiplier(level), cp, hp)
+        projection.inferred[key] = Inferred(ivs, projection, number)
+    return projection.inferred[key]
@@ -0,0 +1,171 @@
+#Pokemon levels, and the CP and HP they give a pokemon of any species and IVs
+#a pokemon's level comes from its cp_multiplier (plus additional_cp_multiplier after power ups),
+#the player level settings have the multiplier of every whole level, half levels sit in between
+#numpy is optional, only Projection.project() needs it and imports it
+import math
+import bisect
+
+#levels 1 to 40, what the player level settings held when they were last checked
+CP_MULTIPLIERS = (
+    0.094, 0.16639787, 0.21573247, 0.25572005, 0.29024988,
+    0.3210876, 0.34921268, 0.37523559, 0.39956728, 0.42250001,
+    0.44310755, 0.46279839, 0.48168495, 0.49985844, 0.51739395,
+    0.53435433, 0.55079269, 0.56675452, 0.58227891, 0.59740001,
+    0.61215729, 0.62656713, 0.64065295, 0.65443563, 0.667934,
+    0.68116492, 0.69414365, 0.70688421, 0.71939909, 0.7317,
+    0.73776948, 0.74378943, 0.74976104, 0.75568551, 0.76156384,
+    0.76739717, 0.7731865, 0.77893275, 0.78463697, 0.79030001
+)
+
+#the best IV a pokemon can have in each stat
+MAX_IV = 15
+
+class Levels(object):
+    #every half level from 1 and its multiplier, levels[i] goes with multipliers[i]
+    #multipliers are the whole levels', a half level's squared multiplier is halfway between
+    def __init__(self, multipliers=CP_MULTIPLIERS):
+        self.levels = []
+        self.multipliers = []
+        for i, multiplier in enumerate(multipliers):
+            self.levels.append(i + 1.0)
+            self.multipliers.append(multiplier)
+            if i + 1 < len(multipliers):
+                self.levels.append(i + 1.5)
+                self.multipliers.append(math.sqrt((multiplier ** 2 + multipliers[i + 1] ** 2) / 2))
+        #a multiplier belongs to the level it is closest to
+        self.bounds = [(a + b) / 2 for a, b in zip(self.multipliers, self.multipliers[1:])]
+
+    def __len__(self):
+        return len(self.levels)
+
+    @property
+    def max_level(self):
+        return self.levels[-1]
+
+    #from a SettingsCache, None if it has no player level settings
+    @classmethod
+    def from_settings(cls, settings):
+        player_level = settings.playerLevelSettings if settings is not None else None
+        if player_level is None or not player_level.cp_multiplier:
+            return None
+        return cls(tuple(player_level.cp_multiplier))
+
+    #level of a pokemon's cp_multiplier + additional_cp_multiplier, None without one
+    def level(self, multiplier):
+        if not multiplier > 0:
+            return None
+        return self.levels[bisect.bisect(self.bounds, multiplier)]
+
+    #multiplier of a level, rounded to the half level and kept in the table
+    def multiplier(self, level):
+        index = int(round((float(level) - 1) * 2))
+        return self.multipliers[min(max(index, 0), len(self.multipliers) - 1)]
+
+#attack, defense and stamina are base stat plus IV
+def calculate_cp(attack, defense, stamina, multiplier):
+    return max(10, int(attack * math.sqrt(defense) * math.sqrt(stamina) * multiplier * multiplier / 10))
+
+def calculate_hp(stamina, multiplier):
+    return max(10, int(stamina * multiplier))
+
+class Projection(object):
+    #CP and HP of a pokemon at its level and at max_level (the top of the table by default)
+    #perfection is its CP at max_level against a 15/15/15 of the species, in percent
+    #species without base stats (the tsv tables) can't be projected and give None
+    def __init__(self, species, levels, max_level=None):
+        self.species = species
+        self.levels = levels
+        self.max_level = levels.max_level if max_level is None else float(max_level)
+        self.max_multiplier = levels.multiplier(self.max_level)
+        self.perfect = [
+            calculate_cp(a + MAX_IV, d + MAX_IV, s + MAX_IV, self.max_multiplier) if a and d and s else 0
+            for a, d, s in zip(species.attack, species.defense, species.stamina)
+        ]
+        self._tables = None
+        #ivs.infer() results, per species, cp, hp and level
+        self.inferred = {}
+
+    def __contains__(self, number):
+        return 0 < number < len(self.perfect) and self.perfect[number] > 0
+
+    #level None is max_level
+    def cp(self, number, attack, defense, stamina, level=None):
+        multiplier = self.max_multiplier if level is None else self.levels.multiplier(level)
+        return calculate_cp(self.species.attack[number] + attack, self.species.defense[number] + defense,
+                            self.species.stamina[number] + stamina, multiplier)
+
+    def hp(self, number, stamina, level=None):
+        multiplier = self.max_multiplier if level is None else self.levels.multiplier(level)
+        return calculate_hp(self.species.stamina[number] + stamina, multiplier)
+
+    def perfection(self, number, attack, defense, stamina):
+        if number not in self:
+            return None
+        return self.cp(number, attack, defense, stamina) * 100.0 / self.perfect[number]
+
+    #base stats and perfect CPs as arrays, made on first use
+    def tables(self):
+        if self._tables is None:
+            import numpy as np
+            self._tables = (
+                np.array(self.species.attack, dtype=np.float64),
+                np.array(self.species.defense, dtype=np.float64),
+                np.array(self.species.stamina, dtype=np.float64),
+                np.array(self.perfect, dtype=np.float64),
+                np.array(self.levels.multipliers, dtype=np.float64),
+                np.array(self.levels.levels, dtype=np.float64),
+                np.array(self.levels.bounds, dtype=np.float64)
+            )
+        return self._tables
+
+    #every pokemon at once, arguments are arrays (or lists) of the same length
+    #multiplier is cp_multiplier + additional_cp_multiplier
+    #returns arrays of level, cp, hp, max_cp, max_hp and perfection, with the same
+    #values cp(), hp() and perfection() give one at a time (nan where those give None)
+    def project(self, number, attack, defense, stamina, multiplier):
+        import numpy as np
+        base_attack, base_defense, base_stamina, perfect, multipliers, levels, bounds = self.tables()
+        number = np.asarray(number, dtype=np.int64)
+        multiplier = np.asarray(multiplier, dtype=np.float64)
+        attack = base_attack[number] + np.asarray(attack, dtype=np.float64)
+        defense = base_defense[number] + np.asarray(defense, dtype=np.float64)
+        stamina = base_stamina[number] + np.asarray(stamina, dtype=np.float64)
+        known = multiplier > 0
+
+        index = np.searchsorted(bounds, multiplier, side="right")
+        level = np.where(known, levels[index], np.nan)
+        current = multipliers[index]
+        strength = attack * np.sqrt(defense) * np.sqrt(stamina)
+        cp = np.maximum(10, np.floor(strength * current * current / 10)).astype(np.int64)
+        hp = np.maximum(10, np.floor(stamina * current)).astype(np.int64)
+        max_cp = np.maximum(10, np.floor(strength * self.max_multiplier * self.max_multiplier / 10)).astype(np.int64)
+        max_hp = np.maximum(10, np.floor(stamina * self.max_multiplier)).astype(np.int64)
+
+        projected = perfect[number] > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            perfection = np.where(projected, max_cp * 100.0 / perfect[number], np.nan)
+        return {
+            "level": level,
+            "cp": np.where(known, cp, 0),
+            "hp": np.where(known, hp, 0),
+            "max_cp": max_cp,
+            "max_hp": max_hp,
+            "perfection": perfection
+        }
+
+#built once per process, per settings hash (the built in table without settings)
+_levels = {}
+
+def load_levels(settings=None):
+    key = settings.hash if settings is not None else None
+    if key not in _levels:
+        _levels[key] = (Levels.from_settings(settings) if key else None) or Levels()
+    return _levels[key]
+
+#kept with the species, so they go with it
+def load_projection(species, levels=None, max_level=None):
+    levels = levels or load_levels()
+    key = (levels, max_level)
+    if key not in species.projections:
+        species.projections[key] = Projection(species, levels, max_level)
+    return species.projections[key]
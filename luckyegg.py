@@ -0,0 +1,76 @@
+#Fits as many evolutions as possible into the half hour of one lucky egg
+#transfers are done before the egg is popped, the evolutions are checked against
+#the candy in hand, and the burst runs at evolution_delay per request of batch_size
+import time
+
+from plan import check_candy
+
+LUCKY_EGG = 301
+EGG_SECONDS = 30 * 60
+
+#lost popping the egg and on the way to the first evolution
+EGG_MARGIN = 10
+
+#per evolution, doubled by the egg
+EVOLVE_XP = 500
+
+#how many evolutions fit in the window, None if there is no delay to limit them
+def egg_capacity(delay, batch_size, window=EGG_SECONDS, margin=EGG_MARGIN):
+    delay = float(delay)
+    if delay <= 0:
+        return None
+    if window < margin:
+        return 0
+    batches = int((window - margin) // delay) + 1
+    return batches * max(1, int(batch_size))
+
+#evolve is the queue in the order it should run, candy is by family
+#returns what fits (affordable, in order), what the candy doesn't pay for,
+#what is left for another egg, and the projected seconds and XP of the burst
+def pack_window(evolve, candy, delay, batch_size, window=EGG_SECONDS, margin=EGG_MARGIN):
+    problems = []
+    affordable = [p for action, p in check_candy([("evolve", p) for p in evolve], candy, problems)]
+    capacity = egg_capacity(delay, batch_size, window, margin)
+    fits = affordable if capacity is None else affordable[:capacity]
+    batch_size = max(1, int(batch_size))
+    batches = (len(fits) + batch_size - 1) // batch_size
+    return {
+        "evolve": fits,
+        "unaffordable": problems,
+        "left": affordable[len(fits):],
+        "capacity": capacity,
+        "seconds": max(0, batches - 1) * float(delay),
+        "xp": len(fits) * EVOLVE_XP * 2
+    }
+
+#seconds left of a lucky egg that is already running, 0 if there is none
+#applied is the inventory's applied items
+def egg_left(applied, now=None):
+    egg = applied.get(LUCKY_EGG)
+    if egg is None:
+        return 0
+    return max(0, egg.expire_ms / 1000.0 - (time.time() if now is None else now))
+
+class EggProgress(object):
+    #running totals of a burst, for the log line after every request
+    def __init__(self, total, window=EGG_SECONDS, clock=time.time):
+        self.total = total
+        self.window = window
+        self.clock = clock
+        self.start = clock()
+        self.evolved = 0
+        self.xp = 0
+
+    @property
+    def deadline(self):
+        return self.start + self.window
+
+    def add(self, evolved, xp):
+        self.evolved += evolved
+        self.xp += xp
+
+    def __str__(self):
+        elapsed = max(self.clock() - self.start, 1e-6)
+        left = max(0, int(self.deadline - self.clock()))
+        return '{0}/{1} evolved, {2} XP, {3:.1f} per minute, {4}:{5:02d} of the egg left'.format(
+            self.evolved, self.total, self.xp, self.evolved * 60 / elapsed, left // 60, left % 60)
@@ -0,0 +1,73 @@
+#Candy-aware evolution planning
+#every evolution costs its species' candy and gives one back, every transfer refunds one,
+#and candy is shared by a whole family (pidgey, pidgeotto and pidgeot all use pidgey candy)
+#transfers go first so their refunds count, then the evolutions in the order planned
+
+EVOLVE_CANDY = 1
+TRANSFER_CANDY = 1
+
+#one family
+#evolvable is a (cost, group) per species that can evolve, every group highest IV first
+#transferable are the pokemon that go unless they evolve, lowest IV first
+#returns the evolutions in the order to do them, what is left to transfer,
+#the candy each evolution cost net of what it gave up, and the refunds they depend on
+def plan_family(candy, evolvable, transferable, limit=None):
+    #the candy an evolution really costs: its price less the candy it gives back,
+    #plus the refund lost when the pokemon would otherwise be transferred
+    transferring = set(transferable)
+    candidates = []
+    for cost, group in evolvable:
+        for rank, p in enumerate(group):
+            lost = TRANSFER_CANDY if p in transferring else 0
+            candidates.append((cost - EVOLVE_CANDY + lost, cost, rank, len(candidates), p, lost))
+    candidates.sort()
+
+    #cheapest first, while the candy in hand covers every evolution up to this one
+    #budget is what there is once the transfers are done
+    budget = candy + TRANSFER_CANDY * len(transferable)
+    spent = 0
+    lowest = None
+    evolve = []
+    costs = []
+    for marginal, cost, rank, _, p, lost in candidates:
+        if limit is not None and len(evolve) >= limit:
+            break
+        low = -spent - cost if lowest is None else min(lowest, -spent - cost)
+        if budget - lost + low < 0:
+            break
+        budget -= lost
+        lowest = low
+        spent += cost - EVOLVE_CANDY
+        evolve.append(p)
+        costs.append(marginal)
+
+    evolving = set(evolve)
+    refunds = max(0, -lowest - candy) if lowest is not None else 0
+    return {
+        "evolve": evolve,
+        "transfer": [p for p in transferable if p not in evolving],
+        "costs": costs,
+        "refunds": refunds
+    }
+
+#every family, with at most limit evolutions over all of them
+#families is a dict of family -> (candy, evolvable, transferable)
+#past the limit the evolutions that cost the most candy are dropped
+def plan_inventory(families, limit=None):
+    plans = dict((family, plan_family(*families[family])) for family in families)
+    total = sum(len(plan["evolve"]) for plan in plans.values())
+    if limit is None or total <= limit:
+        return plans
+
+    #every family's costs only go up, so the dearest are always the last ones planned
+    costs = [(plan["costs"][i], i, family) for family, plan in plans.items() for i in range(len(plan["evolve"]))]
+    costs.sort(reverse=True)
+    keep = dict((family, len(plan["evolve"])) for family, plan in plans.items())
+    for _, i, family in costs[:total - limit]:
+        keep[family] = min(keep[family], i)
+
+    for family, count in keep.items():
+        if count < len(plans[family]["evolve"]):
+            candy, evolvable, transferable = families[family]
+            plans[family] = plan_family(candy, evolvable, transferable, count)
+    return plans
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+
+from pokemondata import get_config
+
+PLAN_VERSION = 1
+
+#candy each action is expected to bring, evolutions cost their price first
+TRANSFER_CANDY = 1
+EVOLVE_CANDY = 1
+
+#{username} in a plan path becomes the account's name, for one plan per account
+def plan_path(path, config):
+    return path.format(username=get_config(config, "username"))
+
+def transfer_reason(data, p):
+    minimum = get_config(data["config"], "minimumIV")
+    if p.iv >= float(minimum):
+        return "duplicate"
+    if get_config(data["config"], "hard_minimum", None):
+        return "below {0}% IV (hard minimum)".format(minimum)
+    return "duplicate below {0}% IV".format(minimum)
+
+def evolve_reason(data, p):
+    return "{0} candy for {1} evolutions".format(p.candy, data["evolve_counts"].get(str(p.number), 0))
+
+def describe(data, action, p, eta):
+    if action == "transfer":
+        reason, candy = transfer_reason(data, p), TRANSFER_CANDY
+    else:
+        reason, candy = evolve_reason(data, p), EVOLVE_CANDY - getattr(p, "cost", 0)
+    return {
+        "action": action,
+        "id": p.id,
+        "number": p.number,
+        "name": p.name,
+        "iv": round(p.iv, 2),
+        "cp": p.cp,
+        "reason": reason,
+        "candy": candy,
+        "eta": eta
+    }
+
+#actions is the ordered (action, pokemon) list a run would submit
+#queues run side by side, so every action type only waits for its own delay,
+#unless the evolutions need transfer refunds (optimize), then they start after the last transfer
+def make_plan(data, actions):
+    config = data["config"]
+    batch_size = max(1, int(get_config(config, "batch_size", None) or 1))
+    delays = {
+        "transfer": float(get_config(config, "transfer_delay")),
+        "evolve": float(get_config(config, "evolution_delay"))
+    }
+    refunds = data.get("refunds", 0)
+    counts = {"transfer": 0, "evolve": 0}
+    starts = {"transfer": 0, "evolve": 0}
+    if refunds:
+        transfers = len([action for action, p in actions if action == "transfer"])
+        starts["evolve"] = ((transfers - 1) // batch_size) * delays["transfer"] if transfers else 0
+    planned = []
+    for action, p in actions:
+        planned.append(describe(data, action, p, starts[action] + (counts[action] // batch_size) * delays[action]))
+        counts[action] += 1
+
+    return {
+        "version": PLAN_VERSION,
+        "created": int(time.time()),
+        "account": {"auth_service": get_config(config, "auth_service"), "username": get_config(config, "username")},
+        "settings": {"transfer_delay": delays["transfer"], "evolution_delay": delays["evolve"], "batch_size": batch_size},
+        "actions": planned,
+        "refunds": refunds,
+        "candy": sum(a["candy"] for a in planned),
+        "seconds": max([a["eta"] for a in planned] or [0])
+    }
+
+def write_plan(plan, path):
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=2, sort_keys=True)
+
+def read_plan(path):
+    with open(path) as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError("{0} is a version {1} plan, expected {2}".format(path, plan.get("version"), PLAN_VERSION))
+    return plan
+
+#checks a plan against a freshly fetched inventory
+#returns the (action, pokemon) pairs that still hold and why the others were dropped
+def validate_plan(plan, data):
+    config = data["config"]
+    account = plan.get("account", {})
+    if str(account.get("username", "")).lower() != str(get_config(config, "username")).lower():
+        return [], ["plan is for {0}, not {1}".format(account.get("username"), get_config(config, "username"))]
+
+    pokemon = dict((p.id, p) for p in data["all"])
+    actions = []
+    problems = []
+    seen = set()
+    for planned in plan["actions"]:
+        p = pokemon.get(planned["id"])
+        if planned["action"] not in ("transfer", "evolve"):
+            problems.append("unknown action {0}".format(planned["action"]))
+        elif p is None:
+            problems.append("{0} {1} ({2}) is gone".format(planned["action"], planned["name"], planned["id"]))
+        elif p.number != planned["number"] or p.cp != planned["cp"]:
+            problems.append("{0} {1} ({2}) changed since the plan".format(planned["action"], planned["name"], planned["id"]))
+        elif planned["id"] in seen:
+            problems.append("{0} ({1}) is planned twice".format(planned["name"], planned["id"]))
+        else:
+            seen.add(planned["id"])
+            actions.append((planned["action"], p))
+    return check_candy(actions, data["candy"], problems, plan.get("refunds")), problems
+
+#drops the evolutions the candy in hand no longer pays for
+#refunds only count when the evolutions wait for the transfers (refunds),
+#running alongside they may come too late
+def check_candy(actions, candy, problems, refunds=False):
+    candy = dict(candy)
+    checked = []
+    for action, p in actions:
+        if action == "transfer" and refunds:
+            candy[p.family] = candy.get(p.family, 0) + TRANSFER_CANDY
+        elif action == "evolve":
+            cost = getattr(p, "cost", 0)
+            if not cost or candy.get(p.family, 0) < cost:
+                problems.append("not enough candy to evolve {0} ({1})".format(p.name, p.id))
+                continue
+            candy[p.family] = candy.get(p.family, 0) - cost + EVOLVE_CANDY
+        checked.append((action, p))
+    return checked
@@ -1,14 +1,15 @@
 import requests
 import re
 import json
+import time
 import random
 import logging
+import threading
 
 from session import PogoSession
+from cache import TicketStore
 from location import Location
 
-from gpsoauth import perform_master_login, perform_oauth
-
 # Callbacks and Constants
 API_URL = 'https://pgorelease.nianticlabs.com/plfe/rpc'
 LOGIN_URL = 'https://sso.pokemon.com/sso/login?service=https%3A%2F%2Fsso.pokemon.com%2Fsso%2Foauth2.0%2FcallbackAuthorize'
@@ -19,6 +20,9 @@ SERVICE = 'audience:server:client_id:848232511240-7so421jotr2609rmqakceuu1luuq0p
 APP = 'com.nianticlabs.pokemongo'
 CLIENT_SIG = '321187995bc7cdc2b5fc91b11a96e2baa8602c62'
 
+# Cached access tokens are renewed this many seconds before they expire
+REFRESH_MARGIN = 300
+
 RPC_ID = int(random.random() * 10 ** 12)
 
 
@@ -29,7 +33,7 @@ def getRPCId():
 
 
 class PokeAuthSession(object):
-    def __init__(self, username, password, provider='google', geo_key=None):
+    def __init__(self, username, password, provider='google', geo_key=None, tokenCache=None, geoCache=None, gazetteer=None):
         self.session = self.createRequestsSession()
         self.provider = provider
 
@@ -38,7 +42,21 @@ class PokeAuthSession(object):
         self.password = password
 
         self.access_token = ''
+        self.expiry = 0
         self.geo_key = geo_key
+        self.geoCache = geoCache
+        self.gazetteer = gazetteer
+
+        # Tokens are reused across runs when there is a cache
+        self.tokenCache = tokenCache
+        self.refreshTimer = None
+
+        # The refresh timer swaps tokens from its own thread,
+        # the live PogoSession gets every new one
+        self.tokenLock = threading.Lock()
+        self.pogoSession = None
+        # The token the last session logged in with
+        self.sessionToken = None
 
     @staticmethod
     def createRequestsSession():
@@ -58,48 +76,85 @@ class PokeAuthSession(object):
         if session:
             location = session.location
         elif locationLookup:
-            location = Location(locationLookup, self.geo_key)
+            location = Location(locationLookup, self.geo_key, self.geoCache, self.gazetteer)
             logging.info(location)
 
-        if self.access_token and location:
-            return PogoSession(
+        accessToken, _ = self.getToken()
+        if accessToken and location:
+            self.sessionToken = accessToken
+            pogoSession = PogoSession(
                 self.session,
                 self.provider,
-                self.access_token,
-                location
+                accessToken,
+                location,
+                ticketStore=TicketStore(self.tokenCache, self.provider, self.username) if self.tokenCache else None
             )
+            with self.tokenLock:
+                self.pogoSession = pogoSession
+                # A refresh may have come in during the handshake
+                pogoSession.accessToken = self.access_token
+            return pogoSession
 
         # else something has gone wrong
         elif location is None:
             logging.critical('Location not found')
-        elif self.access_token is None:
+        elif accessToken is None:
             logging.critical('Access token not generated')
         return None
 
     def createGoogleSession(self, locationLookup='', session=None):
 
         logging.info('Creating Google session for %s', self.username)
+        if not self.loadToken('google'):
+            self.loginGoogle()
 
-        r1 = perform_master_login(self.username, self.password, ANDROID_ID)
-        r2 = perform_oauth(
+        return self.createPogoSession(
+            provider='google',
+            locationLookup=locationLookup,
+            session=session
+        )
+
+    def loginGoogle(self):
+        # The master token lasts until the password changes, try it first
+        cached = self.tokenCache.load('google', self.username) if self.tokenCache else {}
+        masterToken = cached.get('master_token')
+        r2 = {}
+        if masterToken:
+            r2 = self.performOauth(masterToken)
+        if not r2.get('Auth'):
+            from gpsoauth import perform_master_login
+            r1 = perform_master_login(self.username, self.password, ANDROID_ID)
+            masterToken = r1.get('Token', '')
+            r2 = self.performOauth(masterToken)
+
+        self.setToken(r2.get('Auth'), int(r2.get('Expiry', 0)))
+        self.storeToken('google', master_token=masterToken)
+
+    def performOauth(self, masterToken):
+        # gpsoauth is only imported when there is no cached token
+        from gpsoauth import perform_oauth
+        return perform_oauth(
             self.username,
-            r1.get('Token', ''),
+            masterToken,
             ANDROID_ID,
             SERVICE,
             APP,
             CLIENT_SIG
         )
 
-        self.access_token = r2.get('Auth')  # access token
+    def createPTCSession(self, locationLookup='', session=None):
+        logging.info('Creating PTC session for %s', self.username)
+        if not self.loadToken('ptc'):
+            self.loginPTC()
+
         return self.createPogoSession(
-            provider='google',
+            provider='ptc',
             locationLookup=locationLookup,
             session=session
         )
 
-    def createPTCSession(self, locationLookup='', session=None):
+    def loginPTC(self):
         instance = self.createRequestsSession()
-        logging.info('Creating PTC session for %s', self.username)
         r = instance.get(LOGIN_URL)
         jdata = json.loads(r.content.decode())
         data = {
@@ -126,14 +181,87 @@ class PokeAuthSession(object):
             'code': ticket,
         }
         r2 = instance.post(LOGIN_OAUTH, data=data1)
-        self.access_token = re.sub('&expires.*', '', r2.content.decode('utf-8'))
-        self.access_token = re.sub('.*access_token=', '', self.access_token)
+        content = r2.content.decode('utf-8')
+        accessToken = re.sub('&expires.*', '', content)
+        accessToken = re.sub('.*access_token=', '', accessToken)
 
-        return self.createPogoSession(
-            provider='ptc',
-            locationLookup=locationLookup,
-            session=session
+        # Expiry comes in seconds from now
+        expires = re.search('expires=([0-9]+)', content)
+        self.setToken(accessToken, int(time.time()) + int(expires.group(1)) if expires else 0)
+        self.storeToken('ptc')
+
+    # Token cache
+    def setToken(self, accessToken, expiry):
+        """Swap in a new access token, for the live session as well"""
+        with self.tokenLock:
+            self.access_token = accessToken
+            self.expiry = expiry
+            if self.pogoSession is not None:
+                self.pogoSession.accessToken = accessToken
+
+    def getToken(self):
+        with self.tokenLock:
+            return self.access_token, self.expiry
+
+    def loadToken(self, provider):
+        """Use a cached access token if it isn't about to expire"""
+        if not self.tokenCache:
+            return False
+        cached = self.tokenCache.load(provider, self.username)
+        if not cached.get('access_token') or cached.get('expiry', 0) - REFRESH_MARGIN < time.time():
+            return False
+
+        logging.info('Using cached %s token for %s', provider, self.username)
+        self.setToken(cached['access_token'], cached['expiry'])
+        self.scheduleRefresh()
+        return True
+
+    def storeToken(self, provider, **tokens):
+        accessToken, expiry = self.getToken()
+        if not self.tokenCache or not accessToken:
+            return
+        self.tokenCache.store(
+            provider,
+            self.username,
+            access_token=accessToken,
+            expiry=expiry,
+            **tokens
         )
+        self.scheduleRefresh()
+
+    def forgetToken(self):
+        """Drop the cached access token and ticket, the server didn't take them"""
+        self.setToken('', 0)
+        if self.tokenCache:
+            self.tokenCache.store(self.provider, self.username, access_token='', expiry=0)
+            TicketStore(self.tokenCache, self.provider, self.username).clear()
+
+    def scheduleRefresh(self):
+        """Renew the access token in the background before it expires"""
+        self.cancelRefresh()
+        _, expiry = self.getToken()
+        if not self.tokenCache or not expiry:
+            return
+        # Not in a loop if the server hands out short lived tokens
+        delay = max(60, expiry - REFRESH_MARGIN - time.time())
+        self.refreshTimer = threading.Timer(delay, self.refreshToken)
+        self.refreshTimer.daemon = True
+        self.refreshTimer.start()
+
+    def cancelRefresh(self):
+        if self.refreshTimer:
+            self.refreshTimer.cancel()
+            self.refreshTimer = None
+
+    def refreshToken(self):
+        logging.debug('Refreshing %s token for %s', self.provider, self.username)
+        try:
+            {
+                "google": self.loginGoogle,
+                "ptc": self.loginPTC
+            }[self.provider]()
+        except Exception as e:
+            logging.warning('Could not refresh token: %s', e)
 
     def authenticate(self, locationLookup):
         """We already have all information, authenticate"""
@@ -144,6 +272,12 @@ class PokeAuthSession(object):
 
     def reauthenticate(self, session):
         """Reauthenticate from an old session"""
+        # A token refreshed in the background since the session started is tried first
+        accessToken, expiry = self.getToken()
+        if accessToken and accessToken != self.sessionToken and expiry - REFRESH_MARGIN > time.time():
+            logging.info('Trying the refreshed %s token for %s', self.provider, self.username)
+            return self.createPogoSession(provider=self.provider, session=session)
+        self.forgetToken()
         return {
             "google": self.createGoogleSession,
             "ptc": self.createPTCSession
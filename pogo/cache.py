@@ -0,0 +1,364 @@
+import protos
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+
+GlobalSettings_pb2 = protos.lazy('POGOProtos.Settings.GlobalSettings_pb2')
+AuthTicket_pb2 = protos.lazy('POGOProtos.Networking.Envelopes.AuthTicket_pb2')
+DownloadItemTemplatesResponse_pb2 = protos.lazy('Networking.Responses.DownloadItemTemplatesResponse_pb2')
+
+# Everything cached on disk lives here, relative to the working directory
+CACHE_DIR = 'cache'
+
+# Saved auth tickets this close to expiry aren't worth resuming with
+TICKET_MARGIN_MS = 60 * 1000
+
+# Geocoded places are looked up again after this many seconds
+GEOCODE_TTL = 30 * 24 * 3600
+
+
+def writeFile(path, data, mode=None):
+    """Write to a temporary file first so readers never see half a file"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # One per process, several accounts may share the cache directory
+    tmp = '{0}.{1}.tmp'.format(path, os.getpid())
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(tmp, flags, mode if mode is not None else 0o666)
+    with os.fdopen(fd, 'wb') as f:
+        # A leftover tmp file keeps its old mode
+        if mode is not None and hasattr(os, 'fchmod'):
+            os.fchmod(f.fileno(), mode)
+        f.write(data)
+
+    # os.replace is missing on python 2, and rename can't overwrite on windows
+    if hasattr(os, 'replace'):
+        os.replace(tmp, path)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+
+
+def readFile(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+class SettingsCache(object):
+    """Global settings and item templates on disk, keyed on the settings hash.
+
+    Nothing is read until it is first asked for.
+    """
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self._hash = None
+        self._settings = None
+        self._templates = None
+        self._pokemonSettings = None
+        self._moveSettings = None
+        self._playerLevelSettings = None
+
+    def __str__(self):
+        s = 'Settings cache: {0}\nHash: {1}'.format(self.path, self.hash)
+        return s
+
+    def getPath(self, name):
+        return os.path.join(self.path, name)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            data = readFile(self.getPath('settings.hash'))
+            self._hash = data.decode('utf-8').strip() if data else ''
+        return self._hash
+
+    @property
+    def settings(self):
+        """Cached GlobalSettings, or None"""
+        if self._settings is None and self.hash:
+            data = readFile(self.getPath('settings_{0}.pb'.format(self.hash)))
+            if data is not None:
+                self._settings = GlobalSettings_pb2.GlobalSettings()
+                self._settings.ParseFromString(data)
+        return self._settings
+
+    @property
+    def templates(self):
+        """Cached DownloadItemTemplatesResponse for the current hash, or None"""
+        if self._templates is None and self.hash:
+            data = readFile(self.getPath('templates_{0}.pb'.format(self.hash)))
+            if data is not None:
+                self._templates = DownloadItemTemplatesResponse_pb2.DownloadItemTemplatesResponse()
+                self._templates.ParseFromString(data)
+        return self._templates
+
+    # Only settings which came with a new hash need storing
+    def storeSettings(self, response):
+        if not response.hash or not response.HasField('settings'):
+            return False
+        if response.hash == self.hash and self.settings is not None:
+            return False
+
+        logging.debug('Caching settings for hash %s', response.hash)
+        writeFile(
+            self.getPath('settings_{0}.pb'.format(response.hash)),
+            response.settings.SerializeToString()
+        )
+        writeFile(self.getPath('settings.hash'), response.hash.encode('utf-8'))
+
+        # Templates belong to the old hash
+        if response.hash != self._hash:
+            self.clearTemplates()
+        self._hash = response.hash
+        self._settings = GlobalSettings_pb2.GlobalSettings()
+        self._settings.CopyFrom(response.settings)
+        return True
+
+    def storeTemplates(self, response):
+        if not response.success or not self.hash:
+            return False
+
+        logging.debug('Caching item templates for hash %s', self.hash)
+        writeFile(
+            self.getPath('templates_{0}.pb'.format(self.hash)),
+            response.SerializeToString()
+        )
+        self.clearTemplates()
+        self._templates = response
+        return True
+
+    def clearTemplates(self):
+        self._templates = None
+        self._pokemonSettings = None
+        self._moveSettings = None
+        self._playerLevelSettings = None
+
+    # Lookups into the templates
+    @property
+    def pokemonSettings(self):
+        """PokemonSettings keyed on pokemon_id"""
+        if self._pokemonSettings is None and self.templates is not None:
+            self._pokemonSettings = {}
+            for template in self.templates.item_templates:
+                if template.HasField('pokemon_settings'):
+                    self._pokemonSettings[template.pokemon_settings.pokemon_id] = template.pokemon_settings
+        return self._pokemonSettings
+
+    @property
+    def moveSettings(self):
+        """MoveSettings keyed on movement_id"""
+        if self._moveSettings is None and self.templates is not None:
+            self._moveSettings = {}
+            for template in self.templates.item_templates:
+                if template.HasField('move_settings'):
+                    self._moveSettings[template.move_settings.movement_id] = template.move_settings
+        return self._moveSettings
+
+    @property
+    def playerLevelSettings(self):
+        if self._playerLevelSettings is None and self.templates is not None:
+            for template in self.templates.item_templates:
+                if template.HasField('player_level'):
+                    self._playerLevelSettings = template.player_level
+        return self._playerLevelSettings
+
+
+class TokenCache(object):
+    """Auth tokens on disk, one file per provider and username.
+
+    Files are only readable by their owner, as they stand in for the password.
+    """
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+
+    def getPath(self, provider, username):
+        digest = hashlib.sha1(username.lower().encode('utf-8')).hexdigest()
+        return os.path.join(self.path, 'auth_{0}_{1}.json'.format(provider, digest))
+
+    def load(self, provider, username):
+        data = readFile(self.getPath(provider, username))
+        if data is None:
+            return {}
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            logging.warning('Ignoring broken token cache for %s', username)
+            return {}
+
+    # Keeps whatever was stored before and isn't given
+    def store(self, provider, username, **tokens):
+        cached = self.load(provider, username)
+        cached.update(tokens)
+        writeFile(
+            self.getPath(provider, username),
+            json.dumps(cached, sort_keys=True).encode('utf-8'),
+            0o600
+        )
+        return cached
+
+    def clear(self, provider, username):
+        try:
+            os.remove(self.getPath(provider, username))
+        except OSError:
+            pass
+
+
+class TicketStore(object):
+    """Endpoint and auth ticket of one account, kept in its token cache file"""
+
+    def __init__(self, tokenCache, provider, username):
+        self.tokenCache = tokenCache
+        self.provider = provider
+        self.username = username
+
+    def load(self):
+        """Saved endpoint and ticket, None for both unless the ticket is still good"""
+        cached = self.tokenCache.load(self.provider, self.username)
+        if not cached.get('endpoint') or not cached.get('auth_ticket'):
+            return None, None
+
+        ticket = AuthTicket_pb2.AuthTicket()
+        try:
+            ticket.ParseFromString(base64.b64decode(cached['auth_ticket']))
+        except Exception:
+            return None, None
+        if ticket.expire_timestamp_ms - TICKET_MARGIN_MS < time.time() * 1000:
+            return None, None
+        return cached['endpoint'], ticket
+
+    def store(self, endpoint, ticket):
+        self.tokenCache.store(
+            self.provider,
+            self.username,
+            endpoint=endpoint,
+            auth_ticket=base64.b64encode(ticket.SerializeToString()).decode('ascii')
+        )
+
+    def clear(self):
+        self.tokenCache.store(self.provider, self.username, endpoint='', auth_ticket='')
+
+
+class GeocodeCache(object):
+    """Geocoder results on disk, so known places don't need the network"""
+
+    def __init__(self, path=CACHE_DIR, ttl=GEOCODE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._places = None
+
+    def getPath(self):
+        return os.path.join(self.path, 'geocode.json')
+
+    @staticmethod
+    def getKey(search):
+        return ' '.join(search.lower().split())
+
+    @property
+    def places(self):
+        if self._places is None:
+            data = readFile(self.getPath())
+            try:
+                self._places = json.loads(data.decode('utf-8')) if data else {}
+            except ValueError:
+                self._places = {}
+        return self._places
+
+    def get(self, search):
+        """(latitude, longitude, altitude) unless unknown or too old"""
+        place = self.places.get(self.getKey(search))
+        if place is None or place['time'] + self.ttl < time.time():
+            return None
+        return place['latitude'], place['longitude'], place['altitude']
+
+    def store(self, search, coordinates):
+        latitude, longitude, altitude = coordinates
+        self.places[self.getKey(search)] = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'altitude': altitude,
+            'time': int(time.time())
+        }
+        writeFile(self.getPath(), json.dumps(self.places, indent=2, sort_keys=True).encode('utf-8'))
+
+
+class ActionJournal(object):
+    """Write-ahead log of the transfers and evolutions of one run, per account.
+
+    One JSON record per line, flushed to disk before the next step:
+    the plan, each batch just before it is sent, and each result as the
+    server gave it. A run that finishes removes the file, one that dies
+    leaves it for the next run to pick up where it stopped.
+    """
+
+    def __init__(self, path, provider, username):
+        digest = hashlib.sha1(username.lower().encode('utf-8')).hexdigest()
+        self.file = os.path.join(path, 'journal_{0}_{1}.jsonl'.format(provider, digest))
+
+    def append(self, record, mode='a'):
+        directory = os.path.dirname(self.file)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.file, mode) as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def plan(self, actions):
+        """Starts a new journal with the (action, pokemon id) pairs to run, in order"""
+        self.append({'plan': [[action, pokemonId] for action, pokemonId in actions], 'time': int(time.time())}, 'w')
+
+    def sent(self, action, pokemonIds):
+        self.append({'sent': action, 'ids': list(pokemonIds)})
+
+    def record(self, action, pokemonId, status):
+        self.append({'action': action, 'id': pokemonId, 'status': status})
+
+    def finish(self):
+        try:
+            os.remove(self.file)
+        except OSError:
+            pass
+
+    def load(self):
+        """The unfinished run, None if there is none.
+
+        Gives the planned actions in order, the status of each finished one
+        and the ones sent without an answer. A torn last line is ignored.
+        """
+        data = readFile(self.file)
+        if not data:
+            return None
+
+        journal = {'plan': [], 'status': {}, 'sent': set()}
+        for line in data.decode('utf-8').splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if 'plan' in record:
+                journal['plan'] = [(action, pokemonId) for action, pokemonId in record['plan']]
+            elif 'sent' in record:
+                journal['sent'].update((record['sent'], pokemonId) for pokemonId in record['ids'])
+            elif 'status' in record:
+                journal['status'][(record['action'], record['id'])] = record['status']
+        journal['sent'].difference_update(journal['status'])
+        return journal if journal['plan'] else None
+
+
+def resultName(response):
+    """SUCCESS, FAILED_... for a ReleasePokemonResponse or EvolvePokemonResponse"""
+    enum = response.DESCRIPTOR.fields_by_name['result'].enum_type
+    value = enum.values_by_number.get(response.result)
+    return value.name if value is not None else str(response.result)
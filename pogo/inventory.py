@@ -1,11 +1,13 @@
+from collections import OrderedDict
+
+
 class Inventory(dict):
 
     # Split from inventory since everything is bundled
-    def __init__(self, items):
-        # Reset inventory
-        # Assuming sincetimestamp = 0
-        # Otherwise have to associate time state,
-        # and that's a pain
+    def __init__(self, items=()):
+        # Start from an empty inventory and merge the first
+        # (full, sincetimestamp = 0) delta into it.
+        # Later deltas are merged on top via merge()
         self["incubators"] = []
         self["pokedex"] = {}
         self["candies"] = {}
@@ -13,7 +15,23 @@ class Inventory(dict):
         self["party"] = []
         self["eggs"] = []
         self["bag"] = {}
+        # Items in use (lucky eggs, incense) keyed on item id
+        self["applied"] = {}
+
+        # All pokemon and eggs keyed on id, party/eggs are views of this
+        self.pokemon = OrderedDict()
+        self.merge(items)
+
+    def merge(self, items):
+        """Merge a list of InventoryItems (an InventoryDelta) into the inventory"""
+        changed = False
         for item in items:
+            # Deleted items only carry the key, which is the pokemon id
+            if item.deleted_item_key:
+                if self.pokemon.pop(item.deleted_item_key, None) is not None:
+                    changed = True
+                continue
+
             data = item.inventory_item_data
 
             if data.HasField("player_stats"):
@@ -32,10 +50,8 @@ class Inventory(dict):
 
             pokemonData = getattr(data, "pokemon_data", None)
             if data.HasField("pokemon_data"):
-                if pokemonData.is_egg:
-                    self["eggs"].append(pokemonData)
-                else:
-                    self["party"].append(pokemonData)
+                self.pokemon[pokemonData.id] = pokemonData
+                changed = True
                 continue
 
             incubators = getattr(data, "egg_incubators", None)
@@ -43,11 +59,20 @@ class Inventory(dict):
                 self["incubators"] = incubators.egg_incubator
                 continue
 
+            if data.HasField("applied_items"):
+                self["applied"] = dict((applied.item_id, applied) for applied in data.applied_items.item)
+                continue
+
             bagItem = getattr(data, "item", None)
             if data.HasField("item"):
                 self["bag"][bagItem.item_id] = bagItem.count
                 continue
 
+        # Rebuild the lists in place so held references stay valid
+        if changed:
+            self["party"][:] = [p for p in self.pokemon.values() if not p.is_egg]
+            self["eggs"][:] = [p for p in self.pokemon.values() if p.is_egg]
+
     def __str__(self):
         s = "Inventory:"
 
@@ -73,6 +98,10 @@ class Inventory(dict):
         for key in self["bag"]:
             s += "\n\t{0}: {1}".format(key, self["bag"][key])
 
+        s += "\n-- Applied:"
+        for key in self["applied"]:
+            s += "\n\t{0}: until {1}".format(key, self["applied"][key].expire_ms)
+
         s += "\n-- Incubators:"
         for incubator in self["incubators"]:
             s += "\n\t{0}".format(str(incubator).replace("\n", "\n\t"))
@@ -1,16 +1,35 @@
+import re
+import csv
 from math import sin, cos, sqrt, atan2, radians
-from geopy.geocoders import GoogleV3
 from s2sphere import CellId, LatLng
 from custom_exceptions import GeneralPogoException
 
+# "lat,lng" or "lat,lng,alt"
+COORDINATES = re.compile(r'^\s*([-+]?[0-9]*\.?[0-9]+)\s*,\s*([-+]?[0-9]*\.?[0-9]+)\s*(?:,\s*([-+]?[0-9]*\.?[0-9]+)\s*)?$')
+
+
+def loadGazetteer(path):
+    """Place names from a tsv file: name, latitude, longitude and optionally altitude"""
+    gazetteer = {}
+    with open(path) as f:
+        f.readline()
+        for row in csv.reader(f, delimiter='\t'):
+            if len(row) < 3:
+                continue
+            altitude = float(row[3]) if len(row) > 3 and row[3] else 0.0
+            gazetteer[' '.join(row[0].lower().split())] = (float(row[1]), float(row[2]), altitude)
+    return gazetteer
+
 
 # Wrapper for location
 class Location(object):
-    def __init__(self, locationLookup, geo_key):
+    def __init__(self, locationLookup, geo_key, cache=None, gazetteer=None):
         self.geo_key = geo_key
-        self.locator = GoogleV3()
-        if geo_key:
-            self.locator = GoogleV3(api_key=geo_key)
+
+        # Only built when we have to go online
+        self.locator = None
+        self.cache = cache
+        self.gazetteer = gazetteer or {}
 
         self.latitude, self.longitude, self.altitude = self.setLocation(locationLookup)
 
@@ -42,12 +61,47 @@ class Location(object):
     def getDistance(*coords):
         return Location.getRadianDistance(*[radians(coord) for coord in coords])
 
+    @staticmethod
+    def parseCoordinates(search):
+        """(latitude, longitude, altitude) if search is coordinates, else None"""
+        match = COORDINATES.match(search)
+        if not match:
+            return None
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if abs(latitude) > 90 or abs(longitude) > 180:
+            return None
+        return latitude, longitude, float(match.group(3) or 0.0)
+
+    def getLocator(self):
+        if self.locator is None:
+            # geopy is slow to import and only needed here
+            from geopy.geocoders import GoogleV3
+            self.locator = GoogleV3()
+            if self.geo_key:
+                self.locator = GoogleV3(api_key=self.geo_key)
+        return self.locator
+
     def setLocation(self, search):
+        # Coordinates, the gazetteer and the cache don't need the network
+        coordinates = self.parseCoordinates(search)
+        if coordinates is not None:
+            return coordinates
+        name = ' '.join(search.lower().split())
+        if name in self.gazetteer:
+            return self.gazetteer[name]
+        if self.cache is not None:
+            coordinates = self.cache.get(search)
+            if coordinates is not None:
+                return coordinates
+
         try:
-            geo = self.locator.geocode(search)
+            geo = self.getLocator().geocode(search)
         except:
             raise GeneralPogoException('Error in Geo Request')
-        return geo.latitude, geo.longitude, geo.altitude
+        coordinates = geo.latitude, geo.longitude, geo.altitude
+        if self.cache is not None:
+            self.cache.store(search, coordinates)
+        return coordinates
 
     def setCoordinates(self, latitude, longitude):
         self.latitude = latitude
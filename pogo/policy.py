@@ -0,0 +1,78 @@
+from POGOProtos.Networking.Requests import RequestType_pb2
+
+# Default requests in the order they are appended to an envelope
+DEFAULT_REQUESTS = [
+    RequestType_pb2.GET_HATCHED_EGGS,
+    RequestType_pb2.GET_INVENTORY,
+    RequestType_pb2.CHECK_AWARDED_BADGES,
+    RequestType_pb2.DOWNLOAD_SETTINGS
+]
+
+
+class RequestPolicy(object):
+    """Decides which default requests get bundled into each envelope"""
+
+    def __init__(self, defaults=DEFAULT_REQUESTS, every=None):
+        # Which defaults are sent at all
+        self.defaults = set(defaults)
+
+        # Send each default at most every N calls (1 = every call)
+        self.every = dict((requestType, 1) for requestType in DEFAULT_REQUESTS)
+        if every:
+            self.every.update(every)
+
+        # Defaults that must go out with the next call regardless
+        self.dirty = set()
+
+        self.calls = 0
+        self.lastSent = {}
+
+    def __str__(self):
+        s = 'Defaults: {0}\nEvery: {1}\nDirty: {2}'.format(
+            sorted(RequestType_pb2.RequestType.Name(t) for t in self.defaults),
+            dict((RequestType_pb2.RequestType.Name(t), n) for t, n in self.every.items()),
+            sorted(RequestType_pb2.RequestType.Name(t) for t in self.dirty)
+        )
+        return s
+
+    # Only keep inventory up to date, at most every N calls
+    @classmethod
+    def lean(cls, inventoryEvery=10):
+        return cls(
+            defaults=[RequestType_pb2.GET_INVENTORY],
+            every={RequestType_pb2.GET_INVENTORY: inventoryEvery}
+        )
+
+    def markDirty(self, *requestTypes):
+        self.dirty.update(requestTypes)
+
+    def isDue(self, requestType):
+        if requestType in self.dirty:
+            return True
+        if requestType not in self.defaults:
+            return False
+
+        # Never sent before
+        if requestType not in self.lastSent:
+            return True
+        return self.calls - self.lastSent[requestType] >= self.every[requestType]
+
+    def select(self, defaults=True):
+        """Ordered list of default request types for the next envelope.
+
+        defaults can be True (follow the policy), False (no defaults)
+        or an explicit list of request types.
+        """
+        if not defaults:
+            return []
+        if defaults is not True:
+            return [t for t in DEFAULT_REQUESTS if t in defaults]
+
+        self.calls += 1
+        return [t for t in DEFAULT_REQUESTS if self.isDue(t)]
+
+    # Book keeping once the responses have been parsed
+    def sent(self, requestTypes):
+        for requestType in requestTypes:
+            self.lastSent[requestType] = self.calls
+            self.dirty.discard(requestType)
@@ -0,0 +1,193 @@
+import os
+import sys
+import types
+import importlib
+
+# One stand-in per module name, the real modules are cached by import
+_modules = {}
+
+# All of POGOProtos as one FileDescriptorSet, written by ./compile.sh bundle
+BUNDLE = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'POGOProtos.desc')
+
+
+class LazyModule(object):
+    """Stands in for a generated _pb2 module until something is used from it"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<lazy module {0}{1}>'.format(
+            self._name,
+            '' if self._module is None else ' (loaded)'
+        )
+
+
+def lazy(name):
+    """Module that is only imported on first attribute access"""
+    if name not in _modules:
+        _modules[name] = LazyModule(name)
+    return _modules[name]
+
+
+def load(name):
+    return importlib.import_module(name)
+
+
+def loaded():
+    """Names of the lazy modules imported so far"""
+    return sorted(name for name, module in _modules.items() if module._module is not None)
+
+
+# Older protobuf builds classes through one factory per pool
+_factories = {}
+
+
+def _messageClass(message):
+    from google.protobuf import message_factory
+    if hasattr(message_factory, 'GetMessageClass'):
+        return message_factory.GetMessageClass(message)
+
+    pool = message.file.pool
+    if id(pool) not in _factories:
+        _factories[id(pool)] = message_factory.MessageFactory(pool)
+    cls = _factories[id(pool)].GetPrototype(message)
+
+    # Generated code has nested messages as class attributes, the factory doesn't
+    for nested in message.nested_types:
+        if nested.GetOptions().map_entry:
+            continue
+        setattr(cls, nested.name, _messageClass(nested))
+    return cls
+
+
+class BundleModule(types.ModuleType):
+    """A _pb2 module served from the bundle, classes are built on first use"""
+
+    def __init__(self, name, fileDescriptor):
+        types.ModuleType.__init__(self, name)
+        self.DESCRIPTOR = fileDescriptor
+
+    def __getattr__(self, attr):
+        from google.protobuf.internal import enum_type_wrapper
+
+        descriptor = self.DESCRIPTOR
+        if attr in descriptor.message_types_by_name:
+            value = _messageClass(descriptor.message_types_by_name[attr])
+        elif attr in descriptor.enum_types_by_name:
+            value = enum_type_wrapper.EnumTypeWrapper(descriptor.enum_types_by_name[attr])
+        else:
+            # Top level enum values, like RequestType_pb2.GET_INVENTORY
+            for enum in descriptor.enum_types_by_name.values():
+                if attr in enum.values_by_name:
+                    value = enum.values_by_name[attr].number
+                    break
+            else:
+                raise AttributeError(attr)
+        setattr(self, attr, value)
+        return value
+
+
+class BundleImporter(object):
+    """Serves every POGOProtos _pb2 module from one descriptor pool.
+
+    Modules are found under both of their names, POGOProtos.Networking...
+    and Networking... (pogo/POGOProtos is on the path), and both names give
+    the same module.
+    """
+
+    def __init__(self, path=BUNDLE):
+        from google.protobuf import descriptor_pb2, descriptor_pool
+
+        files = descriptor_pb2.FileDescriptorSet()
+        with open(path, 'rb') as f:
+            files.ParseFromString(f.read())
+
+        self.pool = descriptor_pool.DescriptorPool()
+        self.files = set()
+        for fileProto in files.file:
+            self.pool.Add(fileProto)
+            self.files.add(fileProto.name)
+        self.modules = {}
+
+    @staticmethod
+    def getFilename(fullname):
+        if not fullname.endswith('_pb2'):
+            return None
+        if not fullname.startswith('POGOProtos.'):
+            fullname = 'POGOProtos.' + fullname
+        return fullname[:-len('_pb2')].replace('.', '/') + '.proto'
+
+    def find_spec(self, fullname, path=None, target=None):
+        if self.getFilename(fullname) not in self.files:
+            return None
+        import importlib.util
+        return importlib.util.spec_from_loader(fullname, self)
+
+    def create_module(self, spec):
+        filename = self.getFilename(spec.name)
+        if filename not in self.modules:
+            self.modules[filename] = BundleModule(spec.name, self.pool.FindFileByName(filename))
+        return self.modules[filename]
+
+    def exec_module(self, module):
+        pass
+
+
+def installBundle(path=BUNDLE):
+    """Serve generated modules from the bundle, before any of them is imported"""
+    for finder in sys.meta_path:
+        if isinstance(finder, BundleImporter):
+            return finder
+    finder = BundleImporter(path)
+    sys.meta_path.insert(0, finder)
+    return finder
+
+
+def buildBundle(path=BUNDLE):
+    """Write every generated module's file descriptor to one FileDescriptorSet"""
+    from google.protobuf import descriptor_pb2
+
+    root = os.path.dirname(os.path.realpath(__file__))
+    names = []
+    for directory, _, filenames in os.walk(os.path.join(root, 'POGOProtos')):
+        for filename in filenames:
+            if filename.endswith('_pb2.py'):
+                relative = os.path.relpath(os.path.join(directory, filename[:-3]), root)
+                names.append(relative.replace(os.sep, '.'))
+
+    # Dependencies go first, the pool wants them added in that order
+    files = descriptor_pb2.FileDescriptorSet()
+    added = set()
+
+    def add(descriptor):
+        if descriptor.name in added:
+            return
+        for dependency in descriptor.dependencies:
+            add(dependency)
+        added.add(descriptor.name)
+        files.file.add().ParseFromString(descriptor.serialized_pb)
+
+    for name in sorted(names):
+        add(importlib.import_module(name).DESCRIPTOR)
+
+    with open(path, 'wb') as f:
+        f.write(files.SerializeToString())
+    return len(files.file)
+
+
+# POGO_PROTOS=bundle switches everything over, files is the default
+# Building the bundle always reads the files
+if os.environ.get('POGO_PROTOS') == 'bundle' and os.path.isfile(BUNDLE) and __name__ != '__main__':
+    installBundle()
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+    import POGOProtos
+    print('{0} files written to {1}'.format(buildBundle(), BUNDLE))
@@ -1,30 +1,44 @@
+# Before any generated module, they may come from the bundle
+import protos
+
 # Load Generated Protobuf
 from POGOProtos.Networking.Requests import Request_pb2
 from POGOProtos.Networking.Requests import RequestType_pb2
 from POGOProtos.Networking.Envelopes import ResponseEnvelope_pb2
 from POGOProtos.Networking.Envelopes import RequestEnvelope_pb2
-from POGOProtos.Networking.Requests.Messages import EncounterMessage_pb2
-from POGOProtos.Networking.Requests.Messages import FortSearchMessage_pb2
-from POGOProtos.Networking.Requests.Messages import CatchPokemonMessage_pb2
-from POGOProtos.Networking.Requests.Messages import GetInventoryMessage_pb2
-from POGOProtos.Networking.Requests.Messages import GetMapObjectsMessage_pb2
-from POGOProtos.Networking.Requests.Messages import EvolvePokemonMessage_pb2
-from POGOProtos.Networking.Requests.Messages import ReleasePokemonMessage_pb2
-from POGOProtos.Networking.Requests.Messages import DownloadSettingsMessage_pb2
-from POGOProtos.Networking.Requests.Messages import UseItemEggIncubatorMessage_pb2
-from POGOProtos.Networking.Requests.Messages import RecycleInventoryItemMessage_pb2
 
 # Load local
 import api
+from cache import SettingsCache
 from custom_exceptions import GeneralPogoException
 from inventory import Inventory
 from location import Location
+from policy import RequestPolicy, DEFAULT_REQUESTS
 from state import State
 
+# Request messages are only imported once used
+EncounterMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.EncounterMessage_pb2')
+FortSearchMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.FortSearchMessage_pb2')
+CatchPokemonMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.CatchPokemonMessage_pb2')
+GetInventoryMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.GetInventoryMessage_pb2')
+GetMapObjectsMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.GetMapObjectsMessage_pb2')
+EvolvePokemonMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.EvolvePokemonMessage_pb2')
+ReleasePokemonMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.ReleasePokemonMessage_pb2')
+DownloadSettingsMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.DownloadSettingsMessage_pb2')
+DownloadItemTemplatesMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.DownloadItemTemplatesMessage_pb2')
+UseItemEggIncubatorMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.UseItemEggIncubatorMessage_pb2')
+RecycleInventoryItemMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.RecycleInventoryItemMessage_pb2')
+UseItemXpBoostMessage_pb2 = protos.lazy('POGOProtos.Networking.Requests.Messages.UseItemXpBoostMessage_pb2')
+
 import requests
 import logging
 import time
 
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
 # Hide errors (Yes this is terrible, but prettier)
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
@@ -34,19 +48,35 @@ API_URL = 'https://pgorelease.nianticlabs.com/plfe/rpc'
 
 class PogoSession(object):
 
-    def __init__(self, session, authProvider, accessToken, location):
+    def __init__(self, session, authProvider, accessToken, location, cache=None, apiUrl=API_URL, ticketStore=None):
         self.session = session
         self.authProvider = authProvider
         self.accessToken = accessToken
         self.location = location
         self.state = State()
 
+        # Inventory is kept across calls and only deltas are requested
+        self.inventory = Inventory()
+        self.inventoryTimestamp = 0
+
+        # Which default requests are bundled per call
+        self.policy = RequestPolicy()
+
+        # Settings and templates survive between runs
+        self.settingsCache = cache or SettingsCache()
+
         self.authTicket = None
+        self.apiUrl = apiUrl
         self.endpoint = None
-        self.endpoint = 'https://{0}{1}'.format(
-            self.createApiEndpoint(),
-            '/rpc'
-        )
+
+        # Resume with the last endpoint and ticket while the ticket is good
+        self.ticketStore = ticketStore
+        self.resumed = False
+        if ticketStore:
+            self.endpoint, self.authTicket = ticketStore.load()
+            self.resumed = self.endpoint is not None
+        if not self.resumed:
+            self.handshake()
 
         # Set up Inventory
         self.getInventory()
@@ -66,14 +96,33 @@ class PogoSession(object):
     def getCoordinates(self):
         return self.location.getCoordinates()
 
+    def setRequestPolicy(self, policy):
+        self.policy = policy
+
+    # Full login: send the token, get a ticket and our endpoint
+    def handshake(self):
+        self.authTicket = None
+        self.endpoint = None
+        self.endpoint = '{0}://{1}{2}'.format(
+            urlparse(self.apiUrl).scheme,
+            self.createApiEndpoint(),
+            '/rpc'
+        )
+        self.storeTicket()
+
+    def storeTicket(self):
+        if self.ticketStore and self.endpoint and self.authTicket:
+            self.ticketStore.store(self.endpoint, self.authTicket)
+
     def createApiEndpoint(self):
         payload = []
         msg = Request_pb2.Request(
             request_type=RequestType_pb2.GET_PLAYER
         )
         payload.append(msg)
-        req = self.wrapInRequest(payload)
-        res = self.request(req, API_URL)
+        # Nothing parses the defaults here, they go out with the next request
+        req = self.wrapInRequest(payload, defaults=False)
+        res = self.request(req, self.apiUrl)
         if res is None:
             logging.critical('Servers seem to be busy. Exiting.')
             raise Exception('Could not connect to servers')
@@ -108,7 +157,7 @@ class PogoSession(object):
 
         # Add requests
         if defaults:
-            payload += self.getDefaults()
+            payload += self.getDefaults(defaults)
         req.requests.extend(payload)
 
         return req
@@ -125,8 +174,9 @@ class PogoSession(object):
         res.ParseFromString(rawResponse.content)
 
         # Update Auth ticket if it exists
-        if res.auth_ticket.start:
+        if res.auth_ticket.start and res.auth_ticket != self.authTicket:
             self.authTicket = res.auth_ticket
+            self.storeTicket()
 
         return res
 
@@ -138,9 +188,21 @@ class PogoSession(object):
             raise GeneralPogoException('Probably server fires.')
 
     def wrapAndRequest(self, payload, defaults=True):
-        res = self.request(self.wrapInRequest(payload, defaults=defaults))
+        # Defaults come right after the payload in the returns
+        offset = len(payload)
+        defaults = self.policy.select(defaults)
+        res = self.request(self.wrapInRequest(list(payload), defaults=defaults))
+
+        # A saved ticket the server doesn't take means logging in again
+        if self.resumed:
+            self.resumed = False
+            if res is not None and not res.returns:
+                logging.info('Saved auth ticket was rejected, logging in again')
+                self.ticketStore.clear()
+                self.handshake()
+                res = self.request(self.wrapInRequest(list(payload), defaults=defaults))
         if defaults:
-            self.parseDefault(res)
+            self.parseDefault(res, defaults, offset)
         if res is None:
             logging.critical(res)
             logging.critical('Servers seem to be busy. Exiting.')
@@ -148,71 +210,91 @@ class PogoSession(object):
 
         return res
 
-    @staticmethod
-    def getDefaults():
-        # Allocate for 4 default requests
-        data = [None, ] * 4
-
-        # Create Egg request
-        data[0] = Request_pb2.Request(
-            request_type=RequestType_pb2.GET_HATCHED_EGGS
-        )
+    def getDefaults(self, defaults=True):
+        data = []
+        for requestType in self.policy.select(defaults):
+            data.append(self.getDefault(requestType))
+        return data
 
+    def getDefault(self, requestType):
         # Create Inventory Request
-        data[1] = Request_pb2.Request(
-            request_type=RequestType_pb2.GET_INVENTORY,
-            request_message=GetInventoryMessage_pb2.GetInventoryMessage(
-                last_timestamp_ms=0
-            ).SerializeToString()
-        )
-
-        # Create Badge request
-        data[2] = Request_pb2.Request(
-            request_type=RequestType_pb2.CHECK_AWARDED_BADGES
-        )
+        if requestType == RequestType_pb2.GET_INVENTORY:
+            return Request_pb2.Request(
+                request_type=RequestType_pb2.GET_INVENTORY,
+                request_message=GetInventoryMessage_pb2.GetInventoryMessage(
+                    last_timestamp_ms=self.inventoryTimestamp
+                ).SerializeToString()
+            )
 
         # Create Settings request
-        data[3] = Request_pb2.Request(
-            request_type=RequestType_pb2.DOWNLOAD_SETTINGS,
-            request_message=DownloadSettingsMessage_pb2.DownloadSettingsMessage(
-                hash="4a2e9bc330dae60e7b74fc85b98868ab4700802e"
-            ).SerializeToString()
-        )
+        # The server only sends settings when our hash is out of date
+        if requestType == RequestType_pb2.DOWNLOAD_SETTINGS:
+            return Request_pb2.Request(
+                request_type=RequestType_pb2.DOWNLOAD_SETTINGS,
+                request_message=DownloadSettingsMessage_pb2.DownloadSettingsMessage(
+                    hash=self.settingsCache.hash
+                ).SerializeToString()
+            )
 
-        return data
+        # Egg and Badge requests have no message
+        return Request_pb2.Request(
+            request_type=requestType
+        )
 
     # Parse the default responses
-    def parseDefault(self, res):
+    def parseDefault(self, res, defaults=DEFAULT_REQUESTS, offset=1):
+        targets = {
+            RequestType_pb2.GET_HATCHED_EGGS: self.state.eggs,
+            RequestType_pb2.GET_INVENTORY: self.state.inventory,
+            RequestType_pb2.CHECK_AWARDED_BADGES: self.state.badges,
+            RequestType_pb2.DOWNLOAD_SETTINGS: self.state.settings
+        }
         try:
-            self.state.eggs.ParseFromString(res.returns[1])
-            self.state.inventory.ParseFromString(res.returns[2])
-            self.state.badges.ParseFromString(res.returns[3])
-            self.state.settings.ParseFromString(res.returns[4])
+            for i, requestType in enumerate(defaults):
+                targets[requestType].ParseFromString(res.returns[offset + i])
         except Exception as e:
             logging.error(e)
             raise GeneralPogoException("Error parsing response. Malformed response")
 
-        # Finally make inventory usable
-        items = self.state.inventory.inventory_delta.inventory_items
-        self.inventory = Inventory(items)
+        # Finally merge the delta into our inventory
+        if RequestType_pb2.GET_INVENTORY in defaults:
+            delta = self.state.inventory.inventory_delta
+            self.inventory.merge(delta.inventory_items)
+            if delta.new_timestamp_ms:
+                self.inventoryTimestamp = delta.new_timestamp_ms
+
+        # Keep new settings for the next run
+        if RequestType_pb2.DOWNLOAD_SETTINGS in defaults:
+            self.settingsCache.storeSettings(self.state.settings)
+
+        self.policy.sent(defaults)
+
+    # Drop the local inventory, next request pulls everything again
+    def resetInventory(self):
+        self.inventory = Inventory()
+        self.inventoryTimestamp = 0
 
     # Hooks for those bundled in default
     # Getters
     def getEggs(self):
+        self.policy.markDirty(RequestType_pb2.GET_HATCHED_EGGS)
         self.getProfile()
         return self.state.eggs
 
     def getInventory(self):
+        self.policy.markDirty(RequestType_pb2.GET_INVENTORY)
         self.getProfile()
         return self.inventory
 
     def getBadges(self):
+        self.policy.markDirty(RequestType_pb2.CHECK_AWARDED_BADGES)
         self.getProfile()
         return self.state.badges
 
     def getDownloadSettings(self):
+        self.policy.markDirty(RequestType_pb2.DOWNLOAD_SETTINGS)
         self.getProfile()
-        return self.state.settings
+        return self.checkDownloadSettings()
 
     # Check, so we don't have to start another request
     def checkEggs(self):
@@ -225,7 +307,12 @@ class PogoSession(object):
         return self.state.badges
 
     def checkDownloadSettings(self):
-        return self.state.settings
+        # Unchanged settings only come back as a hash, fill in from the cache
+        settings = self.state.settings
+        if not settings.HasField('settings') and self.settingsCache.settings is not None:
+            settings.hash = self.settingsCache.hash
+            settings.settings.CopyFrom(self.settingsCache.settings)
+        return settings
 
     # Core api calls
     # Get profile
@@ -244,6 +331,35 @@ class PogoSession(object):
         # Return everything
         return self.state.profile
 
+    # Get item templates, from the cache unless the settings hash moved on
+    def getItemTemplates(self):
+        templates = self.settingsCache.templates
+        if templates is None:
+            templates = self.downloadItemTemplates()
+        return templates
+
+    def downloadItemTemplates(self):
+        # Create request
+        payload = [Request_pb2.Request(
+            request_type=RequestType_pb2.DOWNLOAD_ITEM_TEMPLATES,
+            request_message=DownloadItemTemplatesMessage_pb2.DownloadItemTemplatesMessage(
+            ).SerializeToString()
+        )]
+
+        # Templates are stored under the current settings hash
+        if not self.settingsCache.hash:
+            self.policy.markDirty(RequestType_pb2.DOWNLOAD_SETTINGS)
+
+        # Send
+        res = self.wrapAndRequest(payload)
+
+        # Parse
+        self.state.templates.ParseFromString(res.returns[0])
+        self.settingsCache.storeTemplates(self.state.templates)
+
+        # Return everything
+        return self.state.templates
+
     # Get Location
     def getMapObjects(self, radius=10):
         # Work out location details
@@ -384,6 +500,57 @@ class PogoSession(object):
         # Return everything
         return self.state.release
 
+    # Evolve many Pokemon, chunk_size per envelope
+    def evolvePokemonBatch(self, pokemon_list, chunk_size=10):
+        return self.requestBatch(
+            pokemon_list,
+            chunk_size,
+            RequestType_pb2.EVOLVE_POKEMON,
+            EvolvePokemonMessage_pb2.EvolvePokemonMessage,
+            self.state.evolve
+        )
+
+    # Transfer many Pokemon, chunk_size per envelope
+    def releasePokemonBatch(self, pokemon_list, chunk_size=10):
+        return self.requestBatch(
+            pokemon_list,
+            chunk_size,
+            RequestType_pb2.RELEASE_POKEMON,
+            ReleasePokemonMessage_pb2.ReleasePokemonMessage,
+            self.state.release
+        )
+
+    # Pack one request per pokemon into as few envelopes as possible
+    # Returns (pokemon, response) in the order given
+    def requestBatch(self, pokemon_list, chunk_size, requestType, message, state):
+        results = []
+        for i in range(0, len(pokemon_list), chunk_size):
+            chunk = pokemon_list[i:i + chunk_size]
+
+            # Create request
+            payload = [Request_pb2.Request(
+                request_type=requestType,
+                request_message=message(
+                    pokemon_id=pokemon.id
+                ).SerializeToString()
+            ) for pokemon in chunk]
+
+            # Send
+            res = self.wrapAndRequest(payload)
+
+            # Parse, returns line up with the requests
+            for j, pokemon in enumerate(chunk):
+                response = state.__class__()
+                response.ParseFromString(res.returns[j])
+                results.append((pokemon, response))
+
+        # Last response stays in state like the single calls
+        if results:
+            state.CopyFrom(results[-1][1])
+
+        # Return everything
+        return results
+
     # Throw away items
     def recycleItem(self, item_id, count):
 
@@ -426,6 +593,26 @@ class PogoSession(object):
         # Return everything
         return self.state.incubator
 
+    # Pop a lucky egg, 301 is ITEM_LUCKY_EGG
+    def useXpBoost(self, item_id=301):
+
+        # Create request
+        payload = [Request_pb2.Request(
+            request_type=RequestType_pb2.USE_ITEM_XP_BOOST,
+            request_message=UseItemXpBoostMessage_pb2.UseItemXpBoostMessage(
+                item_id=item_id
+            ).SerializeToString()
+        )]
+
+        # Send
+        res = self.wrapAndRequest(payload)
+
+        # Parse
+        self.state.xpBoost.ParseFromString(res.returns[0])
+
+        # Return everything
+        return self.state.xpBoost
+
     # These act as more logical functions.
     # Might be better to break out seperately
     # Walk over to position in meters
@@ -0,0 +1,619 @@
+#!/usr/bin/python
+"""Local stand-in for the rpc endpoint, for offline and load testing.
+
+Speaks RequestEnvelope/ResponseEnvelope over plain http and keeps a
+simulated player inventory. Start it with
+
+    python pogo/standin.py --pokemon 10000 --latency 0.05 --errors 0.01
+
+and point a PogoSession at it with apiUrl='http://localhost:8000/plfe/rpc'.
+"""
+# Before any generated module, they may come from the bundle
+import protos
+
+# Load Generated Protobuf
+from POGOProtos.Inventory import InventoryItem_pb2
+from POGOProtos.Networking.Requests import RequestType_pb2
+from POGOProtos.Networking.Envelopes import ResponseEnvelope_pb2
+from POGOProtos.Networking.Envelopes import RequestEnvelope_pb2
+from POGOProtos.Networking.Requests.Messages import GetInventoryMessage_pb2
+from POGOProtos.Networking.Requests.Messages import GetMapObjectsMessage_pb2
+from POGOProtos.Networking.Requests.Messages import EvolvePokemonMessage_pb2
+from POGOProtos.Networking.Requests.Messages import ReleasePokemonMessage_pb2
+from POGOProtos.Networking.Requests.Messages import DownloadSettingsMessage_pb2
+from POGOProtos.Networking.Requests.Messages import RecycleInventoryItemMessage_pb2
+from POGOProtos.Networking.Requests.Messages import UseItemEggIncubatorMessage_pb2
+from POGOProtos.Networking.Requests.Messages import UseItemXpBoostMessage_pb2
+from Networking.Responses import CatchPokemonResponse_pb2
+from Networking.Responses import CheckAwardedBadgesResponse_pb2
+from Networking.Responses import DownloadItemTemplatesResponse_pb2
+from Networking.Responses import DownloadSettingsResponse_pb2
+from Networking.Responses import EncounterResponse_pb2
+from Networking.Responses import EvolvePokemonResponse_pb2
+from Networking.Responses import FortSearchResponse_pb2
+from Networking.Responses import GetHatchedEggsResponse_pb2
+from Networking.Responses import GetInventoryResponse_pb2
+from Networking.Responses import GetMapObjectsResponse_pb2
+from Networking.Responses import GetPlayerResponse_pb2
+from Networking.Responses import RecycleInventoryItemResponse_pb2
+from Networking.Responses import ReleasePokemonResponse_pb2
+from Networking.Responses import UseItemEggIncubatorResponse_pb2
+from Networking.Responses import UseItemXpBoostResponse_pb2
+
+# Load local
+from location import Location
+
+import os
+import csv
+import time
+import bisect
+import random
+import socket
+import logging
+import argparse
+import threading
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+SETTINGS_HASH = '4a2e9bc330dae60e7b74fc85b98868ab4700802e'
+DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+# Kinds of injected failure
+ERRORS = ['http', 'empty', 'drop']
+
+
+def loadSpecies(path=DATA_DIR):
+    """Evolution cost, family and children per species from the tsv files"""
+    def readTable(name):
+        with open(os.path.join(path, name)) as f:
+            f.readline()
+            return dict((int(k), int(v)) for k, v in csv.reader(f, delimiter='\t'))
+
+    family = readTable('families.tsv')
+    cost = readTable('evolves.tsv')
+
+    # Chains are numbered in order, 1 -> 2 -> 3
+    # Branching evolutions (eevee) are siblings that all cost nothing
+    children = {}
+    for number in sorted(family):
+        if not cost.get(number):
+            continue
+        following = number + 1
+        if cost.get(following):
+            children[number] = [following]
+            continue
+        children[number] = []
+        while family.get(following) == family[number] and not cost.get(following):
+            children[number].append(following)
+            following += 1
+    return family, cost, children
+
+
+class StandInPlayer(object):
+    """Simulated account, every change is stamped so deltas can be served"""
+
+    def __init__(self, species=None, username='standin'):
+        self.username = username
+        self.family, self.cost, self.children = species or loadSpecies()
+        self.lock = threading.RLock()
+
+        self.timestamp = 1
+        self.nextId = 1
+
+        # InventoryItems keyed on a tuple of (kind, key)
+        self.items = {}
+        # Deleted pokemon id -> timestamp
+        self.deleted = {}
+        # Lucky egg running until, in seconds
+        self.xpBoostUntil = 0
+
+        self.setStats(level=20, experience=210000)
+
+    # Generate a random account with a skewed species distribution
+    @classmethod
+    def generate(cls, pokemon=1000, eggs=9, seed=0, species=None):
+        player = cls(species)
+        rng = random.Random(seed)
+
+        # A handful of species make up most of an inventory
+        numbers = sorted(player.family)
+        rng.shuffle(numbers)
+        cumulative = []
+        total = 0.0
+        for rank in range(len(numbers)):
+            total += 1.0 / (rank + 1)
+            cumulative.append(total)
+
+        for _ in range(pokemon):
+            player.addPokemon(
+                numbers[bisect.bisect(cumulative, rng.random() * total)],
+                attack=rng.randint(0, 15),
+                defense=rng.randint(0, 15),
+                stamina=rng.randint(0, 15),
+                cp=rng.randint(10, 2500)
+            )
+        for _ in range(eggs):
+            player.addPokemon(0, egg=True)
+
+        for familyId in set(player.family.values()):
+            player.setCandy(familyId, rng.randint(0, 400))
+        for itemId, count in [(1, 150), (2, 80), (3, 20), (101, 30), (201, 5), (301, 2), (701, 40)]:
+            player.setItem(itemId, count)
+        return player
+
+    def tick(self):
+        self.timestamp += 1
+        return self.timestamp
+
+    def stamp(self, key, item):
+        item.modified_timestamp_ms = self.tick()
+        self.items[key] = item
+        return item
+
+    def setStats(self, **kwargs):
+        item = self.items.get(('stats', 0), InventoryItem_pb2.InventoryItem())
+        stats = item.inventory_item_data.player_stats
+        for field, value in kwargs.items():
+            setattr(stats, field, value)
+        return self.stamp(('stats', 0), item)
+
+    def getStats(self):
+        return self.items[('stats', 0)].inventory_item_data.player_stats
+
+    def addPokemon(self, number, attack=0, defense=0, stamina=0, cp=10, egg=False):
+        item = InventoryItem_pb2.InventoryItem()
+        pokemon = item.inventory_item_data.pokemon_data
+        pokemon.id = self.nextId
+        pokemon.pokemon_id = number
+        pokemon.is_egg = egg
+        pokemon.cp = cp
+        pokemon.individual_attack = attack
+        pokemon.individual_defense = defense
+        pokemon.individual_stamina = stamina
+        pokemon.creation_time_ms = self.timestamp
+        self.nextId += 1
+        return self.stamp(('pokemon', pokemon.id), item).inventory_item_data.pokemon_data
+
+    def getPokemon(self, id):
+        item = self.items.get(('pokemon', id))
+        return item.inventory_item_data.pokemon_data if item else None
+
+    def removePokemon(self, id):
+        self.items.pop(('pokemon', id))
+        self.deleted[id] = self.tick()
+
+    def getCandy(self, familyId):
+        item = self.items.get(('candy', familyId))
+        return item.inventory_item_data.pokemon_family.candy if item else 0
+
+    def setCandy(self, familyId, candy):
+        item = InventoryItem_pb2.InventoryItem()
+        item.inventory_item_data.pokemon_family.family_id = familyId
+        item.inventory_item_data.pokemon_family.candy = candy
+        self.stamp(('candy', familyId), item)
+
+    def getItem(self, itemId):
+        item = self.items.get(('item', itemId))
+        return item.inventory_item_data.item.count if item else 0
+
+    def setItem(self, itemId, count):
+        item = InventoryItem_pb2.InventoryItem()
+        item.inventory_item_data.item.item_id = itemId
+        item.inventory_item_data.item.count = count
+        self.stamp(('item', itemId), item)
+
+    def setApplied(self, appliedItems):
+        item = InventoryItem_pb2.InventoryItem()
+        item.inventory_item_data.applied_items.CopyFrom(appliedItems)
+        self.stamp(('applied', 0), item)
+
+    @property
+    def pokemonCount(self):
+        return sum(1 for kind, _ in self.items if kind == 'pokemon')
+
+    def getDelta(self, since):
+        delta = GetInventoryResponse_pb2.GetInventoryResponse(success=True)
+        delta.inventory_delta.original_timestamp_ms = since
+        delta.inventory_delta.new_timestamp_ms = self.timestamp
+        for item in self.items.values():
+            if item.modified_timestamp_ms > since:
+                delta.inventory_delta.inventory_items.add().CopyFrom(item)
+
+        # A full inventory has nothing to delete from
+        if since:
+            for id, modified in self.deleted.items():
+                if modified > since:
+                    delta.inventory_delta.inventory_items.add(
+                        modified_timestamp_ms=modified,
+                        deleted_item_key=id
+                    )
+        return delta
+
+
+class StandInHandler(object):
+    """Answers RequestEnvelopes for one player"""
+
+    def __init__(self, player, latency=0.0, errorRate=0.0, errors=ERRORS, seed=None):
+        self.player = player
+        self.latency = latency
+        self.errorRate = errorRate
+        self.errors = errors
+        self.random = random.Random(seed)
+
+        self.settings = DownloadSettingsResponse_pb2.DownloadSettingsResponse(hash=SETTINGS_HASH)
+        self.settings.settings.fort_settings.interaction_range_meters = 40.0
+        self.settings.settings.map_settings.pokemon_visible_range = 70.0
+        self.settings.settings.inventory_settings.max_pokemon = 1000
+        self.settings.settings.minimum_client_version = '0.31.0'
+
+        # Tickets handed out, start -> expire_timestamp_ms
+        self.tickets = {}
+
+        # Counters for benchmarks
+        self.envelopes = 0
+        self.calls = {}
+        self.bytesReceived = 0
+        self.bytesSent = 0
+
+        self.handlers = {
+            RequestType_pb2.GET_PLAYER: self.getPlayer,
+            RequestType_pb2.GET_INVENTORY: self.getInventory,
+            RequestType_pb2.GET_HATCHED_EGGS: self.getHatchedEggs,
+            RequestType_pb2.CHECK_AWARDED_BADGES: self.checkAwardedBadges,
+            RequestType_pb2.DOWNLOAD_SETTINGS: self.downloadSettings,
+            RequestType_pb2.DOWNLOAD_ITEM_TEMPLATES: self.downloadItemTemplates,
+            RequestType_pb2.GET_MAP_OBJECTS: self.getMapObjects,
+            RequestType_pb2.FORT_SEARCH: self.fortSearch,
+            RequestType_pb2.ENCOUNTER: self.encounter,
+            RequestType_pb2.CATCH_POKEMON: self.catchPokemon,
+            RequestType_pb2.RELEASE_POKEMON: self.releasePokemon,
+            RequestType_pb2.EVOLVE_POKEMON: self.evolvePokemon,
+            RequestType_pb2.RECYCLE_INVENTORY_ITEM: self.recycleItem,
+            RequestType_pb2.USE_ITEM_EGG_INCUBATOR: self.useIncubator,
+            RequestType_pb2.USE_ITEM_XP_BOOST: self.useXpBoost
+        }
+
+    # Returns the failure to inject for this envelope, if any
+    def pickError(self):
+        if self.errorRate and self.random.random() < self.errorRate:
+            return self.random.choice(self.errors)
+        return None
+
+    def handle(self, data, host='localhost'):
+        """Serialized RequestEnvelope in, serialized ResponseEnvelope out"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        req = RequestEnvelope_pb2.RequestEnvelope()
+        req.ParseFromString(data)
+
+        res = ResponseEnvelope_pb2.ResponseEnvelope(
+            status_code=1,
+            request_id=req.request_id,
+            api_url=host
+        )
+        if req.HasField('auth_info'):
+            res.auth_ticket.start = os.urandom(16)
+            res.auth_ticket.end = os.urandom(16)
+            res.auth_ticket.expire_timestamp_ms = int((time.time() + 1800) * 1000)
+            self.tickets[res.auth_ticket.start] = res.auth_ticket.expire_timestamp_ms
+
+        # Unknown or expired tickets get an empty envelope, like the real servers
+        elif self.tickets.get(req.auth_ticket.start, 0) < time.time() * 1000:
+            res = ResponseEnvelope_pb2.ResponseEnvelope(status_code=102, request_id=req.request_id)
+            del req.requests[:]
+
+        with self.player.lock:
+            for request in req.requests:
+                self.calls[request.request_type] = self.calls.get(request.request_type, 0) + 1
+                handler = self.handlers.get(request.request_type)
+                res.returns.append(handler(request.request_message) if handler else b'')
+
+        content = res.SerializeToString()
+        self.envelopes += 1
+        self.bytesReceived += len(data)
+        self.bytesSent += len(content)
+        return content
+
+    # Handlers take the request_message, return the serialized response
+    def getPlayer(self, message):
+        res = GetPlayerResponse_pb2.GetPlayerResponse(success=True)
+        res.player_data.username = self.player.username
+        res.player_data.max_pokemon_storage = 1000
+        res.player_data.max_item_storage = 350
+        res.player_data.creation_timestamp_ms = 1468000000000
+        return res.SerializeToString()
+
+    def getInventory(self, message):
+        msg = GetInventoryMessage_pb2.GetInventoryMessage()
+        msg.ParseFromString(message)
+        return self.player.getDelta(msg.last_timestamp_ms).SerializeToString()
+
+    def getHatchedEggs(self, message):
+        return GetHatchedEggsResponse_pb2.GetHatchedEggsResponse(success=True).SerializeToString()
+
+    def checkAwardedBadges(self, message):
+        return CheckAwardedBadgesResponse_pb2.CheckAwardedBadgesResponse(success=True).SerializeToString()
+
+    def downloadSettings(self, message):
+        msg = DownloadSettingsMessage_pb2.DownloadSettingsMessage()
+        msg.ParseFromString(message)
+
+        # Up to date clients only get the hash back
+        if msg.hash == self.settings.hash:
+            return DownloadSettingsResponse_pb2.DownloadSettingsResponse(
+                hash=self.settings.hash
+            ).SerializeToString()
+        return self.settings.SerializeToString()
+
+    def downloadItemTemplates(self, message):
+        res = DownloadItemTemplatesResponse_pb2.DownloadItemTemplatesResponse(
+            success=True,
+            timestamp_ms=self.player.timestamp
+        )
+        for number in sorted(self.player.family):
+            template = res.item_templates.add(template_id='V{0:04d}_POKEMON'.format(number))
+            settings = template.pokemon_settings
+            settings.pokemon_id = number
+            settings.family_id = self.player.family[number]
+            settings.candy_to_evolve = self.player.cost.get(number, 0)
+            settings.evolution_ids.extend(self.player.children.get(number, []))
+            for parent, children in self.player.children.items():
+                if number in children:
+                    settings.parent_pokemon_id = parent
+        return res.SerializeToString()
+
+    def getMapObjects(self, message):
+        msg = GetMapObjectsMessage_pb2.GetMapObjectsMessage()
+        msg.ParseFromString(message)
+        res = GetMapObjectsResponse_pb2.GetMapObjectsResponse(status=1)
+        for cellId in msg.cell_id:
+            res.map_cells.add(
+                s2_cell_id=cellId,
+                current_timestamp_ms=int(time.time() * 1000)
+            )
+        return res.SerializeToString()
+
+    def fortSearch(self, message):
+        return FortSearchResponse_pb2.FortSearchResponse(
+            result=FortSearchResponse_pb2.FortSearchResponse.OUT_OF_RANGE
+        ).SerializeToString()
+
+    def encounter(self, message):
+        return EncounterResponse_pb2.EncounterResponse(
+            status=EncounterResponse_pb2.EncounterResponse.ENCOUNTER_NOT_FOUND
+        ).SerializeToString()
+
+    def catchPokemon(self, message):
+        return CatchPokemonResponse_pb2.CatchPokemonResponse(
+            status=CatchPokemonResponse_pb2.CatchPokemonResponse.CATCH_ERROR
+        ).SerializeToString()
+
+    def releasePokemon(self, message):
+        msg = ReleasePokemonMessage_pb2.ReleasePokemonMessage()
+        msg.ParseFromString(message)
+        Response = ReleasePokemonResponse_pb2.ReleasePokemonResponse
+
+        pokemon = self.player.getPokemon(msg.pokemon_id)
+        if pokemon is None:
+            return Response(result=Response.FAILED).SerializeToString()
+        if pokemon.is_egg:
+            return Response(result=Response.ERROR_POKEMON_IS_EGG).SerializeToString()
+        if pokemon.deployed_fort_id:
+            return Response(result=Response.POKEMON_DEPLOYED).SerializeToString()
+
+        familyId = self.player.family[pokemon.pokemon_id]
+        self.player.removePokemon(pokemon.id)
+        self.player.setCandy(familyId, self.player.getCandy(familyId) + 1)
+        return Response(result=Response.SUCCESS, candy_awarded=1).SerializeToString()
+
+    def evolvePokemon(self, message):
+        msg = EvolvePokemonMessage_pb2.EvolvePokemonMessage()
+        msg.ParseFromString(message)
+        Response = EvolvePokemonResponse_pb2.EvolvePokemonResponse
+
+        pokemon = self.player.getPokemon(msg.pokemon_id)
+        if pokemon is None or pokemon.is_egg:
+            return Response(result=Response.FAILED_POKEMON_MISSING).SerializeToString()
+        if pokemon.deployed_fort_id:
+            return Response(result=Response.FAILED_POKEMON_IS_DEPLOYED).SerializeToString()
+        children = self.player.children.get(pokemon.pokemon_id)
+        if not children:
+            return Response(result=Response.FAILED_POKEMON_CANNOT_EVOLVE).SerializeToString()
+        familyId = self.player.family[pokemon.pokemon_id]
+        cost = self.player.cost[pokemon.pokemon_id]
+        if self.player.getCandy(familyId) < cost:
+            return Response(result=Response.FAILED_INSUFFICIENT_RESOURCES).SerializeToString()
+
+        self.player.removePokemon(pokemon.id)
+        evolved = self.player.addPokemon(
+            self.random.choice(children),
+            attack=pokemon.individual_attack,
+            defense=pokemon.individual_defense,
+            stamina=pokemon.individual_stamina,
+            cp=int(pokemon.cp * 1.8)
+        )
+        self.player.setCandy(familyId, self.player.getCandy(familyId) - cost + 1)
+        experience = 1000 if self.player.xpBoostUntil > time.time() else 500
+        stats = self.player.getStats()
+        self.player.setStats(experience=stats.experience + experience, evolutions=stats.evolutions + 1)
+
+        res = Response(
+            result=Response.SUCCESS,
+            experience_awarded=experience,
+            candy_awarded=1
+        )
+        res.evolved_pokemon_data.CopyFrom(evolved)
+        return res.SerializeToString()
+
+    def recycleItem(self, message):
+        msg = RecycleInventoryItemMessage_pb2.RecycleInventoryItemMessage()
+        msg.ParseFromString(message)
+        Response = RecycleInventoryItemResponse_pb2.RecycleInventoryItemResponse
+
+        count = self.player.getItem(msg.item_id)
+        if count < msg.count:
+            return Response(result=Response.ERROR_NOT_ENOUGH_COPIES).SerializeToString()
+        self.player.setItem(msg.item_id, count - msg.count)
+        return Response(result=Response.SUCCESS, new_count=count - msg.count).SerializeToString()
+
+    def useIncubator(self, message):
+        msg = UseItemEggIncubatorMessage_pb2.UseItemEggIncubatorMessage()
+        msg.ParseFromString(message)
+        return UseItemEggIncubatorResponse_pb2.UseItemEggIncubatorResponse(
+            result=UseItemEggIncubatorResponse_pb2.UseItemEggIncubatorResponse.ERROR_INCUBATOR_NOT_FOUND
+        ).SerializeToString()
+
+    def useXpBoost(self, message):
+        msg = UseItemXpBoostMessage_pb2.UseItemXpBoostMessage()
+        msg.ParseFromString(message)
+        Response = UseItemXpBoostResponse_pb2.UseItemXpBoostResponse
+
+        if msg.item_id != 301:
+            return Response(result=Response.ERROR_INVALID_ITEM_TYPE).SerializeToString()
+        if self.player.xpBoostUntil > time.time():
+            return Response(result=Response.ERROR_XP_BOOST_ALREADY_ACTIVE).SerializeToString()
+        count = self.player.getItem(msg.item_id)
+        if not count:
+            return Response(result=Response.ERROR_NO_ITEMS_REMAINING).SerializeToString()
+
+        self.player.setItem(msg.item_id, count - 1)
+        self.player.xpBoostUntil = time.time() + 1800
+        res = Response(result=Response.SUCCESS)
+        applied = res.applied_items.item.add()
+        applied.item_id = msg.item_id
+        applied.applied_ms = int(time.time() * 1000)
+        applied.expire_ms = int(self.player.xpBoostUntil * 1000)
+        self.player.setApplied(res.applied_items)
+        return res.SerializeToString()
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        handler = self.server.handler
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        error = handler.pickError()
+        if error == 'drop':
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if error == 'http':
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if error == 'empty':
+            content = ResponseEnvelope_pb2.ResponseEnvelope(status_code=102).SerializeToString()
+        else:
+            content = handler.handle(data, '{0}:{1}'.format(*self.server.server_address[:2]))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-protobuf')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logging.debug(format, *args)
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Threaded http server around a StandInHandler"""
+    daemon_threads = True
+
+    def __init__(self, handler, host='localhost', port=0):
+        HTTPServer.__init__(self, (host, port), StandInRequestHandler)
+        self.handler = handler
+        self.thread = None
+
+    @property
+    def apiUrl(self):
+        return 'http://{0}:{1}/plfe/rpc'.format(*self.server_address[:2])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInTransport(object):
+    """Stands in for a requests session and calls the handler directly"""
+
+    class Response(object):
+        def __init__(self, content):
+            self.content = content
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def post(self, url, data):
+        return self.Response(self.handler.handle(data))
+
+
+class StandInLocation(Location):
+    """Location from coordinates, without going through the geocoder"""
+
+    def __init__(self, latitude=40.7589, longitude=-73.9851, altitude=0.0):
+        Location.__init__(self, '{0},{1},{2}'.format(latitude, longitude, altitude), None)
+
+
+def createSession(server=None, handler=None, cache=None, ticketStore=None):
+    """PogoSession talking to a stand-in server, or in process to a handler"""
+    import api
+    from session import PogoSession
+
+    if server is not None:
+        return PogoSession(
+            api.PokeAuthSession.createRequestsSession(),
+            'google',
+            'stand-in',
+            StandInLocation(),
+            cache=cache,
+            apiUrl=server.apiUrl,
+            ticketStore=ticketStore
+        )
+    return PogoSession(
+        StandInTransport(handler),
+        'google',
+        'stand-in',
+        StandInLocation(),
+        cache=cache,
+        ticketStore=ticketStore
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", help="interface to listen on", default='localhost')
+    parser.add_argument("--port", help="port to listen on", type=int, default=8000)
+    parser.add_argument("--pokemon", help="pokemon in the simulated inventory", type=int, default=1000)
+    parser.add_argument("--seed", help="seed for the simulated inventory", type=int, default=0)
+    parser.add_argument("--latency", help="seconds added to every envelope", type=float, default=0.0)
+    parser.add_argument("--errors", help="fraction of envelopes that fail", type=float, default=0.0)
+    args = parser.parse_args()
+
+    player = StandInPlayer.generate(args.pokemon, seed=args.seed)
+    handler = StandInHandler(player, latency=args.latency, errorRate=args.errors)
+    server = StandInServer(handler, args.host, args.port)
+    logging.info('Stand-in serving %s pokemon on %s', player.pokemonCount, server.apiUrl)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    logging.info('%s envelopes, %s bytes in, %s bytes out', handler.envelopes, handler.bytesReceived, handler.bytesSent)
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,33 @@
-from Networking.Responses import CheckAwardedBadgesResponse_pb2
-from Networking.Responses import DownloadSettingsResponse_pb2
-from Networking.Responses import GetInventoryResponse_pb2
-from Networking.Responses import GetHatchedEggsResponse_pb2
-from Networking.Responses import GetMapObjectsResponse_pb2
-from Networking.Responses import GetPlayerResponse_pb2
-from Networking.Responses import FortSearchResponse_pb2
-from Networking.Responses import EncounterResponse_pb2
-from Networking.Responses import CatchPokemonResponse_pb2
-from Networking.Responses import EvolvePokemonResponse_pb2
-from Networking.Responses import ReleasePokemonResponse_pb2
-from Networking.Responses import UseItemEggIncubatorResponse_pb2
-from Networking.Responses import RecycleInventoryItemResponse_pb2
+import protos
+
+# Response kept for each field, only imported and built when first used
+FIELDS = {
+    'profile': ('Networking.Responses.GetPlayerResponse_pb2', 'GetPlayerResponse'),
+    'eggs': ('Networking.Responses.GetHatchedEggsResponse_pb2', 'GetHatchedEggsResponse'),
+    'inventory': ('Networking.Responses.GetInventoryResponse_pb2', 'GetInventoryResponse'),
+    'badges': ('Networking.Responses.CheckAwardedBadgesResponse_pb2', 'CheckAwardedBadgesResponse'),
+    'settings': ('Networking.Responses.DownloadSettingsResponse_pb2', 'DownloadSettingsResponse'),
+    'templates': ('Networking.Responses.DownloadItemTemplatesResponse_pb2', 'DownloadItemTemplatesResponse'),
+    'mapObjects': ('Networking.Responses.GetMapObjectsResponse_pb2', 'GetMapObjectsResponse'),
+    'fortSearch': ('Networking.Responses.FortSearchResponse_pb2', 'FortSearchResponse'),
+    'encounter': ('Networking.Responses.EncounterResponse_pb2', 'EncounterResponse'),
+    'catch': ('Networking.Responses.CatchPokemonResponse_pb2', 'CatchPokemonResponse'),
+    'evolve': ('Networking.Responses.EvolvePokemonResponse_pb2', 'EvolvePokemonResponse'),
+    'release': ('Networking.Responses.ReleasePokemonResponse_pb2', 'ReleasePokemonResponse'),
+    'recycle': ('Networking.Responses.RecycleInventoryItemResponse_pb2', 'RecycleInventoryItemResponse'),
+    'incubator': ('Networking.Responses.UseItemEggIncubatorResponse_pb2', 'UseItemEggIncubatorResponse'),
+    'xpBoost': ('Networking.Responses.UseItemXpBoostResponse_pb2', 'UseItemXpBoostResponse')
+}
 
 
 class State(object):
     """Class to wrap the current state of responses"""
-    def __init__(self):
-        self.profile = GetPlayerResponse_pb2.GetPlayerResponse()
-        self.eggs = GetHatchedEggsResponse_pb2.GetHatchedEggsResponse()
-        self.inventory = GetInventoryResponse_pb2.GetInventoryResponse()
-        self.badges = CheckAwardedBadgesResponse_pb2.CheckAwardedBadgesResponse()
-        self.settings = DownloadSettingsResponse_pb2.DownloadSettingsResponse()
-        self.mapObjects =  GetMapObjectsResponse_pb2.GetMapObjectsResponse()
-        self.fortSearch = FortSearchResponse_pb2.FortSearchResponse()
-        self.encounter = EncounterResponse_pb2.EncounterResponse()
-        self.catch = CatchPokemonResponse_pb2.CatchPokemonResponse()
-        self.evolve = EvolvePokemonResponse_pb2.EvolvePokemonResponse()
-        self.release = ReleasePokemonResponse_pb2.ReleasePokemonResponse()
-        self.recycle = RecycleInventoryItemResponse_pb2.RecycleInventoryItemResponse()
-        self.incubator = UseItemEggIncubatorResponse_pb2.UseItemEggIncubatorResponse()
+
+    def __getattr__(self, name):
+        # Only called for fields that haven't been built yet
+        if name not in FIELDS:
+            raise AttributeError(name)
+        module, message = FIELDS[name]
+        value = getattr(protos.lazy(module), message)()
+        setattr(self, name, value)
+        return value
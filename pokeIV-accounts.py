@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+import json
+import time
+import logging
+import argparse
+import traceback
+import multiprocessing
+
+import pokeIV
+
+#every account is a json file with the config.json keys that differ for it (username, password, location...)
+#everything else on the command line is passed on to pokeIV for all of them (ex: -t -e -td 15)
+#the options here are long only and not abbreviated, so none of them takes a pokeIV option (-cp, -wl)
+def init_accounts():
+    parser = argparse.ArgumentParser(description="Runs pokeIV for many accounts at once, each with its own session and delays", allow_abbrev=False)
+    parser.add_argument("accounts", help="json files with the settings of one account each", nargs="+")
+    parser.add_argument("--workers", help="accounts run at the same time (default: all of them)", type=int)
+    parser.add_argument("--shared_config", "--shared-config", help="settings shared by all accounts", default="config.json")
+    args, rest = parser.parse_known_args()
+
+    #parsed up front, so any password prompts come before the accounts start
+    configs = []
+    for path in args.accounts:
+        with open(path) as data:
+            account = json.load(data)
+        config = pokeIV.init_config(rest, args.shared_config, account)
+        if not config:
+            logging.error("Skipping %s", path)
+            continue
+        configs.append((path, config))
+    return args, configs
+
+#runs in a worker process, log lines are prefixed with the account
+def run_account(account):
+    path, config = account
+    logger = logging.getLogger()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.setLevel(logging.INFO)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('[{0}] %(message)s'.format(config.username)))
+    logger.addHandler(handler)
+
+    start = time.time()
+    try:
+        summary = pokeIV.run(config, show=False)
+        status = "ok" if summary is not None else "no session"
+    except Exception as e:
+        logging.error(traceback.format_exc())
+        summary, status = None, "error: {0}".format(e)
+    summary = summary or {"pokemon": 0, "transferred": 0, "evolved": 0}
+    summary.update({"account": config.username, "file": path, "status": status, "seconds": time.time() - start})
+    return summary
+
+def print_summary(summaries, seconds):
+    print('{0:<20} {1:>9} {2:>13} {3:>9} {4:>9}  {5}'.format('[account]','[pokemon]','[transferred]','[evolved]','[seconds]','[status]'))
+    for s in summaries:
+        print('{0:<20} {1:>9} {2:>13} {3:>9} {4:>9.0f}  {5}'.format(s["account"],s["pokemon"],s["transferred"],s["evolved"],s["seconds"],s["status"]))
+    print('{0:<20} {1:>9} {2:>13} {3:>9} {4:>9.0f}'.format(
+        'total',
+        sum(s["pokemon"] for s in summaries),
+        sum(s["transferred"] for s in summaries),
+        sum(s["evolved"] for s in summaries),
+        seconds
+    ))
+
+def main():
+    pokeIV.setupLogger()
+
+    args, configs = init_accounts()
+    if not configs:
+        return
+
+    #one process per account: own session, delays, journal and token cache file
+    start = time.time()
+    pool = multiprocessing.Pool(max(1, min(args.workers or len(configs), len(configs))))
+    try:
+        summaries = pool.map(run_account, configs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    print_summary(summaries, time.time() - start)
+
+if __name__ == '__main__':
+    main()
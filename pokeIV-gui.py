@@ -10,19 +10,22 @@ import logging
 import requests
 import argparse
 import getpass
-import csv
 import time
 import tkinter as tk
 from collections import OrderedDict
 
 from pokemondata import PokemonData
+from species import load_species
+from levels import load_levels
 from pokeivwindow import PokeIVWindow
 
 sys.path.insert(0, './pogo')
 from custom_exceptions import GeneralPogoException
 
 from api import PokeAuthSession
-from location import Location
+from policy import RequestPolicy
+from cache import TokenCache, GeocodeCache
+from location import Location, loadGazetteer
 
 # add directory of this file to PATH, so that the package will be found
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
@@ -51,17 +54,22 @@ def init_config():
     parser.add_argument("-a", "--auth_service", help="Auth Service ('ptc' or 'google')",required=required("auth_service"))
     parser.add_argument("-u", "--username", help="Username", required=required("username"))
     parser.add_argument("-p", "--password", help="Password")
-    parser.add_argument("-l", "--location", help="Location", required=required("location"))
+    parser.add_argument("-l", "--location", help="Location (name or 'lat,lng')", required=required("location"))
+    parser.add_argument("-gz", "--gazetteer", help="tsv file of place names and coordinates to look the location up in, instead of online")
     parser.add_argument("-m", "--minimumIV", help="All pokemon equal to or above this IV value are kept regardless of duplicates")
     parser.add_argument("-me", "--max_evolutions", help="Maximum number of evolutions in one pass")
     parser.add_argument("-ed", "--evolution_delay", help="delay between evolutions in seconds")
     parser.add_argument("-td", "--transfer_delay", help="delay between transfers in seconds")
+    parser.add_argument("-j", "--jitter", help="up to this fraction of the delay is added at random to every wait (ex: 0.2)")
     parser.add_argument("-hm", "--hard_minimum", help="transfer candidates will be selected if they are below minimumIV (will transfer unique pokemon)", action="store_true")
     parser.add_argument("-cp", "--cp_override", help="will keep pokemon that have CP equal to or above the given limit, regardless of IV")
     parser.add_argument("-v", "--verbose", help="displays additional information about each pokemon", action="store_true")
     parser.add_argument("-el", "--evolve_list", help="Evolve lsit has been deprecated. Please use white list instead (-wl).", action="append")
     parser.add_argument("-wl", "--white_list", help="list of the only pokemon to transfer and evolve by ID or name (ex: -wl 1 = -wl bulbasaur)", action="append")
     parser.add_argument("-bl", "--black_list", help="list of the pokemon not to transfer and evolve by ID or name (ex: -bl 1 = -bl bulbasaur)", action="append")
+    parser.add_argument("-nc", "--no_token_cache", help="logs in every time instead of reusing tokens stored in the cache directory", action="store_true")
+    parser.add_argument("-o", "--optimize", help="plans transfers and evolutions per family with the candy they give back, including T2 evolutions and max_evolutions", action="store_true")
+    parser.add_argument("-r", "--rank", help="orders each species by 'iv' (default) or by 'perfection', its CP at max level against a perfect one")
     parser.add_argument("-f", "--force", help="forces all pokemon not passing the IV threshold to be transfer candidates regardless of evolution", action="store_true")
     config = parser.parse_args()
     
@@ -92,6 +100,13 @@ def init_config():
         config.__dict__["evolution_delay"] = "25"
     if config.__dict__["transfer_delay"] is None:
         config.__dict__["transfer_delay"] = "10"
+    if config.__dict__["jitter"] is None:
+        config.__dict__["jitter"] = "0"
+    if config.__dict__["rank"] is None:
+        config.__dict__["rank"] = "iv"
+    if config.rank not in ['iv', 'perfection']:
+        logging.error("Invalid rank specified! ('iv' or 'perfection')")
+        return None
     
     if config.white_list is not None and config.black_list is not None:
         logging.error("Black list and white list can not be used together.")
@@ -121,7 +136,10 @@ def main():
         config["username"],
         config["password"],
         config["auth_service"],
-        geo_key=""
+        geo_key="",
+        geoCache=GeocodeCache(),
+        gazetteer=loadGazetteer(config["gazetteer"]) if config["gazetteer"] else None,
+        tokenCache=None if config["no_token_cache"] else TokenCache()
     )
     
     # Authenticate with a given location
@@ -139,20 +157,18 @@ def main():
     pokemon = inventory["party"]
     candy = inventory["candies"]
     
-    # -- dictionaries for pokedex, families, and evolution prices
-    with open('names.tsv') as f:
-        f.readline()
-        pokedex = dict(csv.reader(f, delimiter='\t'))
-        
-    with open('families.tsv') as f:
-        f.readline()
-        family = dict(csv.reader(f, delimiter='\t'))    
-        
-    with open('evolves.tsv') as f:
-        f.readline()
-        cost = dict(csv.reader(f, delimiter='\t'))
-    
-    data = PokemonData(pokemon, candy, pokedex, family, cost, config, session)
+    # -- pokedex, families and evolution prices, compiled once
+    # -- from the item templates if the server sends them, else from the tsv files
+    try:
+        session.getItemTemplates()
+    except (GeneralPogoException, requests.exceptions.RequestException) as e:
+        logging.warning("Item templates not available (%s), using the tsv files", e)
+    species = load_species(settings=session.settingsCache)
+    levels = load_levels(session.settingsCache)
+
+    data = PokemonData(pokemon, candy, species, config=config, session=session, levels=levels)
+    #the actions only bundle the inventory now and then, getInventory() still asks for it
+    session.setRequestPolicy(RequestPolicy.lean())
        
     main_window = tk.Tk()
     app = PokeIVWindow(config,data,session,master=main_window)
@@ -10,16 +10,22 @@ import logging
 import requests
 import argparse
 import getpass
-import csv
 import time
 
-from pokemondataold import PokemonData
+from pokemondata import PokemonData, stat_text
+from species import load_species
+from levels import load_levels
+from scheduler import Scheduler
+from plan import make_plan, write_plan, read_plan, validate_plan, plan_path
+from luckyegg import pack_window, egg_left, EggProgress, LUCKY_EGG, EGG_SECONDS
 
 sys.path.insert(0, './pogo')
 from custom_exceptions import GeneralPogoException
 
 from api import PokeAuthSession
-from location import Location
+from policy import RequestPolicy
+from cache import TokenCache, GeocodeCache, ActionJournal, CACHE_DIR, resultName
+from location import Location, loadGazetteer
 
 # add directory of this file to PATH, so that the package will be found
 sys.path.append(os.path.dirname(os.path.realpath(__file__)))
@@ -33,37 +39,49 @@ def setupLogger():
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
-def init_config():
+#args defaults to the command line, overrides (an account's settings) go over the config file
+def init_config(args=None, config_file="config.json", overrides=None):
     parser = argparse.ArgumentParser()
-    config_file = "config.json"
 
     # If config file exists, load variables from json
     load   = {}
     if os.path.isfile(config_file):
         with open(config_file) as data:
             load.update(json.load(data))
+    if overrides:
+        load.update(overrides)
     
     # Read passed in Arguments
     required = lambda x: not x in load
     parser.add_argument("-a", "--auth_service", help="Auth Service ('ptc' or 'google')",required=required("auth_service"))
     parser.add_argument("-u", "--username", help="Username", required=required("username"))
     parser.add_argument("-p", "--password", help="Password")
-    parser.add_argument("-l", "--location", help="Location", required=required("location"))
+    parser.add_argument("-l", "--location", help="Location (name or 'lat,lng')", required=required("location"))
+    parser.add_argument("-gz", "--gazetteer", help="tsv file of place names and coordinates to look the location up in, instead of online")
     parser.add_argument("-t", "--transfer", help="Transfers all but the highest of each pokemon (see -m)", action="store_true")
     parser.add_argument("-e", "--evolve", help="Evolves as many T1 pokemon that it can (starting with highest IV)", action="store_true")
     parser.add_argument("-m", "--minimumIV", help="All pokemon equal to or above this IV value are kept regardless of duplicates")
     parser.add_argument("-me", "--max_evolutions", help="Maximum number of evolutions in one pass")
     parser.add_argument("-ed", "--evolution_delay", help="delay between evolutions in seconds")
     parser.add_argument("-td", "--transfer_delay", help="delay between transfers in seconds")
+    parser.add_argument("-j", "--jitter", help="up to this fraction of the delay is added at random to every wait (ex: 0.2)")
+    parser.add_argument("-bs", "--batch_size", help="number of transfers or evolutions sent in one request")
     parser.add_argument("-hm", "--hard_minimum", help="transfer candidates will be selected if they are below minimumIV (will transfer unique pokemon)", action="store_true")
     parser.add_argument("-cp", "--cp_override", help="will keep pokemon that have CP equal to or above the given limit, regardless of IV")
     parser.add_argument("-v", "--verbose", help="displays additional information about each pokemon", action="store_true")
     parser.add_argument("-el", "--evolve_list", help="Evolve lsit has been deprecated. Please use white list instead (-wl).", action="append")
     parser.add_argument("-wl", "--white_list", help="list of the only pokemon to transfer and evolve by ID or name (ex: -wl 1 = -wl bulbasaur)", action="append")
     parser.add_argument("-bl", "--black_list", help="list of the pokemon not to transfer and evolve by ID or name (ex: -bl 1 = -bl bulbasaur)", action="append")
+    parser.add_argument("-nc", "--no_token_cache", help="logs in every time instead of reusing tokens stored in the cache directory", action="store_true")
+    parser.add_argument("-nj", "--no_journal", help="doesn't keep a journal of transfers and evolutions to resume an interrupted run from", action="store_true")
+    parser.add_argument("-po", "--plan_out", "--plan-out", help="writes the transfers and evolutions (-t, -e) to this json file instead of doing them, {username} is replaced")
+    parser.add_argument("-x", "--execute", help="does the transfers and evolutions of a plan written with --plan-out, as far as they still hold")
+    parser.add_argument("-le", "--lucky_egg", help="pops a lucky egg after the transfers and fits as many evolutions (-e) as possible into its 30 minutes", action="store_true")
+    parser.add_argument("-o", "--optimize", help="plans transfers and evolutions per family with the candy they give back, including T2 evolutions and max_evolutions", action="store_true")
+    parser.add_argument("-r", "--rank", help="orders each species by 'iv' (default) or by 'perfection', its CP at max level against a perfect one")
     parser.add_argument("-f", "--force", help="forces all pokemon not passing the IV threshold to be transfer candidates regardless of evolution", action="store_true")
     parser.set_defaults(EVOLVE=False, VERBOSE=False, FORCE=False)
-    config = parser.parse_args()
+    config = parser.parse_args(args)
 	  
     # Passed in arguments shoud trump
     for key in config.__dict__:
@@ -92,6 +110,15 @@ def init_config():
         config.__dict__["evolution_delay"] = "25"
     if config.__dict__["transfer_delay"] is None:
         config.__dict__["transfer_delay"] = "10"
+    if config.__dict__["jitter"] is None:
+        config.__dict__["jitter"] = "0"
+    if config.__dict__["rank"] is None:
+        config.__dict__["rank"] = "iv"
+    if config.rank not in ['iv', 'perfection']:
+        logging.error("Invalid rank specified! ('iv' or 'perfection')")
+        return None
+    if config.__dict__["batch_size"] is None:
+        config.__dict__["batch_size"] = "1"
     
     if config.white_list is not None and config.black_list is not None:
         logging.error("Black list and white list can not be used together.")
@@ -123,9 +150,9 @@ def print_pokemon_min(pokemon):
         print('{0:<10} {1:>8} {2:>8.2%}'.format(str(p.name),str(p.cp),p.ivPercent)) 
 
 def print_pokemon_verbose(pokemon):
-    print('{0:<10} {1:>6} {2:>6} {3:>6} {4:>8} {5:>8}'.format('[POKEMON]','[ATK]','[DEF]','[STA]','[CP]','[IV]'))
+    print('{0:<10} {1:>6} {2:>6} {3:>6} {4:>8} {5:>8} {6:>6} {7:>8}'.format('[POKEMON]','[ATK]','[DEF]','[STA]','[CP]','[IV]','[LVL]','[MAX]'))
     for p in pokemon:
-        print('{0:<10} {1:>6} {2:>6} {3:>6} {4:>8} {5:>8.2%}'.format(str(p.name),str(p.attack),str(p.defense),str(p.stamina),str(p.cp),p.ivPercent))
+        print('{0:<10} {1:>6} {2:>6} {3:>6} {4:>8} {5:>8.2%} {6:>6} {7:>8.2%}'.format(str(p.name),stat_text(p.attack),stat_text(p.defense),stat_text(p.stamina),str(p.cp),p.ivPercent,str(p.level or ''),p.perfection/100))
 
 def print_evolve_candidates(data):
     if data["evolve"]:
@@ -138,36 +165,207 @@ def print_evolve_candidates(data):
             elif id in data["needed_counts"] and id in data["unique_counts"]:
                 print('{0:<10} {1:^15} {2:^17} {3:^10}'.format(data["pokedex"][id],data["evolve_counts"][id],data["unique_counts"][id],data["needed_counts"][id]))
 
-def transfer_pokemon(data, session):
+def get_batches(pokemon, size):
+    size = max(1, int(size))
+    return [pokemon[i:i + size] for i in range(0, len(pokemon), size)]
+
+def transfer_pokemon(data, session, scheduler, journal=None):
     if data["config"].transfer and data["transfer"]:
         print('{0:<15} {1:^20} {2:>15}'.format('------------','Transferring','------------'))
-        for p in data["transfer"][:]:
-            id = str(p.number)
-            logging.info('{0:<35} {1:<8} {2:<8.2%}'.format('transferring pokemon: '+str(p.name),str(p.cp),p.ivPercent,))
-            session.releasePokemon(p)
-            if id in list(data["unique_counts"].keys()):
-                data["unique_counts"][id] = data["unique_counts"][id] - 1 #we now have one fewer of these...
-            if p in data["transfer"]:
-                data["transfer"].remove(p)
-            if p in data["all"]:
-                data["all"].remove(p)
-            time.sleep(int(data["config"].transfer_delay))
-
-def evolve_pokemon(data, session):
+        for batch in get_batches(data["transfer"][:], data["config"].batch_size):
+            scheduler.submit("transfer", lambda batch=batch: transfer_batch(data, session, batch, journal))
+
+def transfer_batch(data, session, batch, journal=None):
+    for p in batch:
+        logging.info('{0:<35} {1:<8} {2:<8.2%}'.format('transferring pokemon: '+str(p.name),str(p.cp),p.ivPercent,))
+    if journal:
+        journal.sent("transfer", [p.id for p in batch])
+    try:
+        results = session.releasePokemonBatch(batch, len(batch))
+    except GeneralPogoException as e:
+        #the scheduler slows this queue down and the pokemon stay where they are
+        logging.error('transfer request failed: %s', e)
+        return False
+    for p, result in results:
+        if journal:
+            journal.record("transfer", p.id, resultName(result))
+        if result.result != result.SUCCESS:
+            logging.error('{0:<35} {1:<8} {2:<8.2%}'.format('failed to transfer: '+str(p.name),str(p.cp),p.ivPercent))
+            continue
+        data.add_candy(p.family, result.candy_awarded)
+        id = str(p.number)
+        if id in list(data["unique_counts"].keys()):
+            data["unique_counts"][id] = data["unique_counts"][id] - 1 #we now have one fewer of these...
+        remove_pokemon(data, p)
+
+#out of the index and groups as well as the lists this run works through
+def remove_pokemon(data, p):
+    data.remove_pokemon(p)
+    for key in ("transfer", "evolve", "extra"):
+        if p in data[key]:
+            data[key].remove(p)
+
+#transfers run alongside, don't evolve what is about to be transferred
+def get_evolutions(data):
+    transferring = set(id(p) for p in data["transfer"]) if data["config"].transfer else set()
+    return [p for p in data["evolve"] if id(p) not in transferring]
+
+def evolve_pokemon(data, session, scheduler, journal=None):
     if data["config"].evolve and data["evolve"]:
-        for p in data["evolve"][:]:
-            id = str(p.number)
-            logging.info('{0:<35} {1:<8} {2:<8.2%}'.format('evolving pokemon: '+str(p.name),str(p.cp),p.ivPercent))
-            session.evolvePokemon(p)
+        for batch in get_batches(get_evolutions(data), data["config"].batch_size):
+            scheduler.submit("evolve", lambda batch=batch: evolve_batch(data, session, batch, journal))
+
+def evolve_batch(data, session, batch, journal=None):
+    for p in batch:
+        logging.info('{0:<35} {1:<8} {2:<8.2%}'.format('evolving pokemon: '+str(p.name),str(p.cp),p.ivPercent))
+    if journal:
+        journal.sent("evolve", [p.id for p in batch])
+    try:
+        results = session.evolvePokemonBatch(batch, len(batch))
+    except GeneralPogoException as e:
+        #the scheduler slows this queue down and the pokemon stay where they are
+        logging.error('evolve request failed: %s', e)
+        return False
+    for p, result in results:
+        if journal:
+            journal.record("evolve", p.id, resultName(result))
+        if result.result != result.SUCCESS:
+            logging.error('{0:<35} {1:<8} {2:<8.2%}'.format('failed to evolve: '+str(p.name),str(p.cp),p.ivPercent))
+            continue
+        data["experience"] = data.get("experience", 0) + result.experience_awarded
+        data.add_candy(p.family, result.candy_awarded - getattr(p, "cost", 0))
+        id = str(p.number)
+        #T2 evolutions (-o) have no unique count
+        if id in data["evolve_counts"]:
             data["evolve_counts"][id] = data["evolve_counts"][id] - 1
+        if id in data["unique_counts"]:
             data["unique_counts"][id] = data["unique_counts"][id] - 1
-            if p in data["evolve"]:
-                data["evolve"].remove(p)
-            if p in data["all"]:
-                data["all"].remove(p)
-            if p in data["extra"]:
-                data["extra"].remove(p)
-            time.sleep(int(data["config"].evolution_delay))
+        remove_pokemon(data, p)
+        data.add_pokemon(result.evolved_pokemon_data)
+
+#pops a lucky egg and evolves as much as fits into its half hour, the transfers are done by now
+#an egg that is already running is used for the time it has left, before one from the bag
+def lucky_egg_pokemon(data, session, journal=None):
+    #read again, the egg may have started since the run did
+    inventory = session.getInventory()
+    left = egg_left(inventory["applied"])
+    packed = pack_egg(data, left or EGG_SECONDS)
+    if not packed["evolve"]:
+        return
+    if left:
+        logging.info('A lucky egg is already running, %d:%02d of it left', left // 60, left % 60)
+    elif not inventory["bag"].get(LUCKY_EGG):
+        logging.error('No lucky egg in the bag')
+        return
+    else:
+        result = session.useXpBoost(LUCKY_EGG)
+        if result.result == result.ERROR_XP_BOOST_ALREADY_ACTIVE:
+            #started since the inventory was read
+            left = egg_left(session.getInventory()["applied"])
+            logging.warning('A lucky egg is already running, %d:%02d of it left', left // 60, left % 60)
+            packed = pack_egg(data, left)
+            if not packed["evolve"]:
+                return
+        elif result.result != result.SUCCESS:
+            logging.error('Could not use a lucky egg: %s', resultName(result))
+            return
+
+    #no jitter, the burst is as dense as the delay allows
+    config = data["config"]
+    progress = EggProgress(len(packed["evolve"]), left or EGG_SECONDS)
+    scheduler = Scheduler()
+    scheduler.add_queue("evolve", float(config.evolution_delay))
+    for batch in get_batches(packed["evolve"], config.batch_size):
+        scheduler.submit("evolve", lambda batch=batch: egg_batch(data, session, batch, journal, progress))
+    scheduler.run(until=progress.deadline)
+    logging.info('Lucky egg done: %s', progress)
+
+#the evolutions that fit into window seconds of an egg
+def pack_egg(data, window):
+    config = data["config"]
+    packed = pack_window(get_evolutions(data), data["candy"], config.evolution_delay, config.batch_size, window)
+    for problem in packed["unaffordable"]:
+        logging.warning('Not in the egg: %s', problem)
+    logging.info('Lucky egg: %d evolutions in %d:%02d for about %d XP, %d left for another egg',
+        len(packed["evolve"]), packed["seconds"] // 60, packed["seconds"] % 60, packed["xp"], len(packed["left"]))
+    return packed
+
+def egg_batch(data, session, batch, journal, progress):
+    evolve, experience = len(data["evolve"]), data.get("experience", 0)
+    ok = evolve_batch(data, session, batch, journal)
+    progress.add(evolve - len(data["evolve"]), data.get("experience", 0) - experience)
+    logging.info('Lucky egg: %s', progress)
+    return ok
+
+#everything this run is going to do, in the order it is submitted
+def get_actions(data):
+    actions = []
+    if data["config"].transfer:
+        actions.extend(("transfer", p) for p in data["transfer"])
+    if data["config"].evolve:
+        actions.extend(("evolve", p) for p in get_evolutions(data))
+    return actions
+
+#writes what this run would do instead of doing it
+def save_plan(data, path):
+    plan = make_plan(data, get_actions(data))
+    write_plan(plan, path)
+    logging.info('Planned %d actions in %s: %+d candy, about %d minutes',
+        len(plan["actions"]), path, plan["candy"], int(plan["seconds"] / 60))
+
+#a saved plan replaces the freshly classified lists, as far as it still holds
+def load_plan(data, path):
+    plan = read_plan(path)
+    actions, problems = validate_plan(plan, data)
+    for problem in problems:
+        logging.warning('Skipping from the plan: %s', problem)
+    logging.info('Executing %s: %d of %d planned actions still hold', path, len(actions), len(plan["actions"]))
+    data["transfer"] = [p for action, p in actions if action == "transfer"]
+    data["evolve"] = [p for action, p in actions if action == "evolve"]
+    #evolutions paid for with transfer refunds wait for the transfers, as planned
+    data["refunds"] = plan.get("refunds", 0)
+
+#an interrupted run's unfinished actions replace the freshly classified lists
+#pokemon that are gone from the inventory went through before it stopped
+def resume_journal(data, journal):
+    unfinished = journal.load()
+    if unfinished is None:
+        return False
+    pokemon = dict((p.id, p) for p in data["all"])
+    left = {"transfer": [], "evolve": []}
+    for action, pokemon_id in unfinished["plan"]:
+        if (action, pokemon_id) not in unfinished["status"] and pokemon_id in pokemon and action in left:
+            left[action].append(pokemon[pokemon_id])
+    logging.info('Resuming an interrupted run: %d of %d actions done (%d unanswered), %d transfers and %d evolutions left',
+        len(unfinished["plan"]) - len(left["transfer"]) - len(left["evolve"]), len(unfinished["plan"]),
+        len(unfinished["sent"]), len(left["transfer"]), len(left["evolve"]))
+    data["transfer"] = left["transfer"]
+    data["evolve"] = left["evolve"]
+    return True
+
+#one queue per action type, each at its own delay, their waits overlap
+def create_scheduler(config):
+    scheduler = Scheduler(jitter=float(config.jitter))
+    scheduler.add_queue("transfer", float(config.transfer_delay))
+    scheduler.add_queue("evolve", float(config.evolution_delay))
+    return scheduler
+
+def print_lists(data):
+    #------- best pokemon
+    if data["best"]:
+        print_header('Highest IV Pokemon')
+        print_pokemon(data["best"], data["config"].verbose)
+    #------- transferable pokemon
+    if data["transfer"]:
+        print_header('May be transfered')
+        print_pokemon(data["transfer"], data["config"].verbose)
+    #------- extras that aren't to be transfered
+    if data["other"]:
+        print_header('Other Pokemon')
+        print_pokemon(data["other"], data["config"].verbose)
+    #------- evolve candidate  pokemon
+    if data["evolve"]:
+        print_evolve_candidates(data)
 
 def main():
     setupLogger()
@@ -176,13 +374,20 @@ def main():
     config = init_config()
     if not config:
         return
+    run(config)
 
+#one account from login to the last evolution
+#returns what was done, None if it never got to the pokemon
+def run(config, show=True):
     # Create PokoAuthObject
     poko_session = PokeAuthSession(
         config.username,
         config.password,
         config.auth_service,
-        geo_key=""
+        geo_key="",
+        geoCache=GeocodeCache(),
+        gazetteer=loadGazetteer(config.gazetteer) if config.gazetteer else None,
+        tokenCache=None if config.no_token_cache else TokenCache()
     )
     
     # Authenticate with a given location
@@ -200,46 +405,65 @@ def main():
     pokemon = inventory["party"]
     candy = inventory["candies"]
     
-    # -- dictionaries for pokedex, families, and evolution prices
-    with open('names.tsv') as f:
-        f.readline()
-        pokedex = dict(csv.reader(f, delimiter='\t'))
-        
-    with open('families.tsv') as f:
-        f.readline()
-        family = dict(csv.reader(f, delimiter='\t'))    
-        
-    with open('evolves.tsv') as f:
-        f.readline()
-        cost = dict(csv.reader(f, delimiter='\t'))
-    
-    data = PokemonData(pokemon, candy, pokedex, family, cost, config)
+    # -- pokedex, families and evolution prices, compiled once
+    # -- from the item templates if the server sends them, else from the tsv files
+    try:
+        session.getItemTemplates()
+    except (GeneralPogoException, requests.exceptions.RequestException) as e:
+        logging.warning("Item templates not available (%s), using the tsv files", e)
+    species = load_species(settings=session.settingsCache)
+    levels = load_levels(session.settingsCache)
+
+    data = PokemonData(pokemon, candy, species, config=config, levels=levels)
     
     if len(data["all"]) == 0:
         print('You have no pokemon...')
-        return
+        return {"pokemon": 0, "transferred": 0, "evolved": 0}
     
-    #------- best pokemon
-    if data["best"]:
-        print_header('Highest IV Pokemon')
-        print_pokemon(data["best"], data["config"].verbose)
-    #------- transferable pokemon
-    if data["transfer"]:
-        print_header('May be transfered')
-        print_pokemon(data["transfer"], data["config"].verbose)
-    #------- extras that aren't to be transfered
-    if data["other"]:
-        print_header('Other Pokemon')
-        print_pokemon(data["other"], data["config"].verbose)
-    #------- evolve candidate  pokemon
-    if data["evolve"]:
-        print_evolve_candidates(data)
-    #------- transfer extra pokemon
+    if show:
+        print_lists(data)
+    #------- or only write down what would be done, for --execute to do later
+    if config.plan_out:
+        save_plan(data, plan_path(config.plan_out, config))
+        return {"pokemon": len(pokemon), "transferred": 0, "evolved": 0}
+    #------- transfer extra pokemon and evolve t1 pokemon, side by side
+    #------- journaled, so a run that dies is picked up by the next one
+    journal = None if config.no_journal else ActionJournal(CACHE_DIR, config.auth_service, config.username)
+    resumed = journal is not None and resume_journal(data, journal)
+    if config.execute:
+        if not resumed:
+            load_plan(data, plan_path(config.execute, config))
+        config.transfer = bool(data["transfer"])
+        config.evolve = bool(data["evolve"])
+    if journal and not resumed and get_actions(data):
+        journal.plan([(action, p.id) for action, p in get_actions(data)])
+    #the actions only bundle the inventory now and then, getInventory() still asks for it
+    session.setRequestPolicy(RequestPolicy.lean())
+    transfers = len(data["transfer"]) if data["config"].transfer else 0
+    evolutions = len(data["evolve"]) if data["config"].evolve else 0
+    scheduler = create_scheduler(data["config"])
     if data["config"].transfer and data["transfer"]:
-        transfer_pokemon(data, session)
-    #------- evolving t1 pokemon
+        transfer_pokemon(data, session, scheduler, journal)
+    #evolutions paid for with transfer refunds, or saved for a lucky egg, wait for the transfers
+    if data["config"].evolve and (data.get("refunds") or config.lucky_egg):
+        if data.get("refunds") and not data["config"].transfer:
+            logging.warning('%d candy of the planned evolutions comes from transfers, use -t as well', data["refunds"])
+        scheduler.run()
     if data["config"].evolve and data["evolve"]:
-        evolve_pokemon(data, session)
+        if config.lucky_egg:
+            lucky_egg_pokemon(data, session, journal)
+        else:
+            evolve_pokemon(data, session, scheduler, journal)
+    scheduler.run()
+    #whatever this run wasn't asked to do stays journaled for the next one
+    if journal and (data["config"].transfer or not data["transfer"]) and (data["config"].evolve or not data["evolve"]):
+        journal.finish()
     
+    return {
+        "pokemon": len(pokemon),
+        "transferred": transfers - len(data["transfer"]) if transfers else 0,
+        "evolved": evolutions - len(data["evolve"]) if evolutions else 0
+    }
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
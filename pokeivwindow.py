@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 
+import logging
 from tkinter import ttk
 import tkinter as tk
+from scheduler import Scheduler
+from pokemondata import stat_text
 
 class PokeIVWindow(tk.Frame):
     def __init__(self, config, data, session, master=None):
@@ -10,8 +13,9 @@ class PokeIVWindow(tk.Frame):
         self.session = session
         self.logText = tk.StringVar()
         self.logText.set("idle...")
-        self.transfer_ids = []
-        self.evolve_ids = []
+        self.scheduler = Scheduler(jitter=float(config["jitter"] or 0))
+        self.tick_id = None
+        self.ticking = False
         self.check_boxes = {}
         self.config = config
         self.config_boxes = {}
@@ -297,7 +301,7 @@ class PokeIVWindow(tk.Frame):
                 self.evolve_window.tree.selection_remove(sel)
         
     def get_info(self,pokemon):
-        return (str(pokemon.name),str(pokemon.attack),str(pokemon.defense),str(pokemon.stamina),str(pokemon.cp),str('{0:>2.2%}').format(pokemon.ivPercent))
+        return (str(pokemon.name),stat_text(pokemon.attack),stat_text(pokemon.defense),stat_text(pokemon.stamina),str(pokemon.cp),str('{0:>2.2%}').format(pokemon.ivPercent))
         
     def get_columns(self):
         return {'verbose': ('POKEMON','ATK','DEF','STA','CP','IV'),
@@ -339,14 +343,43 @@ class PokeIVWindow(tk.Frame):
     
     def evolve_pokemon(self, pokemon, cont):
         self.log_info('{0:<35} {1:<8} {2:<8.2%}'.format('evolving pokemon: '+str(pokemon.name),str(pokemon.cp),pokemon.ivPercent), "working")
-        self.disable_buttons()
-        self.evolve_ids.append(self.evolve_button.after(int(self.config["evolution_delay"])*1000, lambda: self.evolve(pokemon, cont)))
+        self.evolve_button.config(state="disabled")
+        self.schedule("evolve", self.config["evolution_delay"], lambda: self.evolve(pokemon, cont))
         
     def transfer_pokemon(self, pokemon, cont):
         self.log_info('{0:<35} {1:<8} {2:<8.2%}'.format('transferring pokemon: '+str(pokemon.name),str(pokemon.cp),pokemon.ivPercent,), "working")
-        self.disable_buttons()
-        self.transfer_ids.append(self.transfer_button.after(int(self.config["transfer_delay"])*1000, lambda: self.transfer(pokemon, cont)))
+        self.transfer_button.config(state="disabled")
+        self.schedule("transfer", self.config["transfer_delay"], lambda: self.transfer(pokemon, cont))
     
+    #transfers and evolves have their own queue and delay, so both can run at once
+    def schedule(self, name, delay, action):
+        if name not in self.scheduler.queues:
+            self.scheduler.add_queue(name, float(delay))
+        else:
+            self.scheduler.queues[name].set_interval(float(delay))
+        self.scheduler.jitter = float(self.config["jitter"] or 0)
+        self.scheduler.submit(name, action)
+        if not self.ticking: #actions queue their follow ups from inside tick
+            self.tick()
+        
+    def tick(self):
+        if self.tick_id is not None:
+            self.after_cancel(self.tick_id)
+            self.tick_id = None
+        self.ticking = True
+        try:
+            wait = self.scheduler.step()
+        except Exception as e: #a failed request mustn't stall the actions queued behind it
+            logging.exception('action failed')
+            self.log_info('action failed: ' + str(e), "error")
+            self.enable_buttons()
+            self.reset_windows()
+            wait = 0 if self.scheduler.pending() else None
+        finally:
+            self.ticking = False
+        if wait is not None:
+            self.tick_id = self.after(int(wait*1000) + 1, self.tick)
+        
     def evolve_all_pokemon(self):
         #if there was a pokemon selected from evolve list, evolve only that
         if self.pokemon_selected_action("evolve"):
@@ -381,29 +414,27 @@ class PokeIVWindow(tk.Frame):
         
     def transfer(self, p, cont):
         self.data.transfer_pokemon(p)
-        self.enable_buttons()
+        self.transfer_button.config(state="normal")
         if cont and self.data["transfer"]:
             self.transfer_all_pokemon()
-        else:
+        elif not self.scheduler.pending():
             self.log_info("idle...")
         self.reset_windows()
 
     def evolve(self, p, cont):
         self.data.evolve_pokemon(p)
-        self.enable_buttons()
+        self.evolve_button.config(state="normal")
         if cont and self.data["evolve"]:
             self.evolve_all_pokemon()
-        else:
+        elif not self.scheduler.pending():
             self.log_info("idle...")
         self.reset_windows()
     
     def cancel_actions(self):
-        for id in self.transfer_ids[:]:
-            self.transfer_button.after_cancel(id)
-            self.transfer_ids.remove(id)
-        for id in self.evolve_ids[:]:
-            self.evolve_button.after_cancel(id)
-            self.evolve_ids.remove(id)
+        self.scheduler.clear()
+        if self.tick_id is not None:
+            self.after_cancel(self.tick_id)
+            self.tick_id = None
         self.enable_buttons()
         self.log_info("idle...")
         self.reset_windows()
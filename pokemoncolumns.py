@@ -0,0 +1,177 @@
+#Columnar (numpy) version of the PokemonData classification
+#for offline analysis of large or many inventories.
+#numpy is optional, summarize() falls back to PokemonData without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pokemondata import PokemonData, get_config
+from species import Species
+from levels import load_projection
+from ivs import infer
+
+LISTS = ("all", "best", "extra", "transfer", "other", "evolve")
+
+class PokemonColumns(object):
+    #takes the same arguments as PokemonData, config as a dict or namespace
+    def __init__(self, pokemon, candies, pokedex, family=None, cost=None, config=None, levels=None):
+        if np is None:
+            raise ImportError("PokemonColumns needs numpy")
+        self.candies = candies
+        self.species = Species.coerce(pokedex, family, cost)
+        self.projection = load_projection(self.species, levels)
+        self.config = config
+        self.family_table = np.array(self.species.family, dtype=np.int32)
+        self.cost_table = np.array(self.species.cost, dtype=np.int32)
+        self.set_columns(pokemon)
+        self.classify()
+
+    def get_config(self, key, *default):
+        return get_config(self.config, key, *default)
+
+    #straight from the protobuf party list
+    def set_columns(self, pokemon):
+        count = len(pokemon)
+        self.id = np.fromiter((p.id for p in pokemon), dtype=np.uint64, count=count)
+        stats = np.fromiter(
+            (x for p in pokemon for x in (p.pokemon_id, p.individual_attack, p.individual_defense, p.individual_stamina, p.cp)),
+            dtype=np.int32, count=count * 5).reshape(count, 5)
+        self.number = stats[:, 0].copy()
+        self.attack = stats[:, 1].copy()
+        self.defense = stats[:, 2].copy()
+        self.stamina = stats[:, 3].copy()
+        self.cp = stats[:, 4].copy()
+        self.iv = (self.stamina + self.attack + self.defense) / float(45) * 100
+        multiplier = np.fromiter((p.cp_multiplier + p.additional_cp_multiplier for p in pokemon), dtype=np.float64, count=count)
+        projected = self.projection.project(self.number, self.attack, self.defense, self.stamina, multiplier)
+        self.level = projected["level"]
+        self.perfection = np.where(np.isnan(projected["perfection"]), self.iv, projected["perfection"])
+        self.iv_max = self.iv.copy()
+
+        #IVs the server didn't send, one species, cp, hp and level at a time like PokemonData
+        unknown = np.flatnonzero((self.attack == 0) & (self.defense == 0) & (self.stamina == 0) & ~np.isnan(self.level))
+        for i in unknown.tolist():
+            inferred = infer(self.projection, int(self.number[i]), int(self.cp[i]), pokemon[i].stamina_max, float(self.level[i]))
+            if inferred:
+                self.iv[i], self.iv_max[i], self.perfection[i] = inferred.expected, inferred.max, inferred.perfection
+        self.family = self.family_table[self.number]
+        self.cost = self.cost_table[self.number]
+        families = np.unique(self.family)
+        candy_table = np.zeros(len(self.family_table), dtype=np.int32)
+        for f in families:
+            candy_table[f] = self.candies.get(int(f), 0)
+        self.candy = candy_table[self.family]
+
+    def listed(self, number):
+        #same rules as PokemonData.black_listed/white_listed, per species
+        name = self.species.names[number].lower()
+        black_list = self.get_config("black_list")
+        white_list = self.get_config("white_list")
+        if black_list is not None and (str(number) in black_list or name in black_list):
+            return True
+        return not (white_list is None or str(number) in white_list or name in white_list)
+
+    def classify(self):
+        count = len(self.id)
+        minimum = float(self.get_config("minimumIV"))
+        override = self.get_config("cp_override")
+        override = int(override) if override is not None and int(override) > 0 else None
+
+        #"all": rank descending, ties in inventory order like PokemonData
+        ranking = self.perfection if self.get_config("rank", None) == "perfection" else self.iv
+        self.order = np.argsort(-ranking, kind="stable")
+        rank = np.empty(count, dtype=np.int64)
+        rank[self.order] = np.arange(count)
+
+        #group by species, highest ranked first within each group
+        grouped = np.lexsort((rank, self.number))
+        numbers, starts, sizes = np.unique(self.number[grouped], return_index=True, return_counts=True)
+        position = np.empty(count, dtype=np.int64)
+        position[grouped] = np.arange(count) - np.repeat(starts, sizes)
+        size = np.empty(count, dtype=np.int64)
+        size[grouped] = np.repeat(sizes, sizes)
+
+        #per species values, indexed by pokemon number
+        listed = np.zeros(len(self.family_table), dtype=bool)
+        for n in numbers:
+            listed[n] = self.listed(int(n))
+        t1 = self.number == self.family
+        evolve_count = np.where(self.cost > 0, self.candy // np.maximum(self.cost, 1), 0)
+        evolve_count = np.where(t1 & ~listed[self.number], evolve_count, 0)
+
+        best = self.iv_max >= minimum
+        if not self.get_config("hard_minimum"):
+            best |= position == 0
+            if override is not None:
+                best |= self.cp >= override
+        extra = ~best
+
+        #extras counted from the bottom (lowest IV) of each group
+        from_bottom = np.zeros(count, dtype=np.int64)
+        reverse = grouped[::-1]
+        extra_reverse = extra[reverse].astype(np.int64)
+        cumulative = np.cumsum(extra_reverse)
+        group_end = np.repeat(np.cumsum(sizes[::-1]) - sizes[::-1], sizes[::-1])
+        before = np.concatenate(([0], cumulative))[group_end]
+        from_bottom[reverse] = cumulative - before - 1
+
+        keep = np.maximum(0, size - evolve_count)
+        transfer = extra & ~listed[self.number]
+        if not self.get_config("force"):
+            transfer &= (evolve_count == 0) | (from_bottom < keep)
+
+        self.masks = {
+            "all": np.ones(count, dtype=bool),
+            "best": best,
+            "extra": extra,
+            "transfer": transfer,
+            "other": extra & ~transfer,
+            "evolve": ~listed[self.number] & (position < evolve_count)
+        }
+
+        #counts keyed like PokemonData, species in order of their best pokemon
+        first = numbers[np.argsort(rank[grouped][starts], kind="stable")]
+        self.evolve_counts = dict()
+        self.unique_counts = dict()
+        self.needed_counts = dict()
+        sizes_by_number = dict(zip(numbers.tolist(), sizes.tolist()))
+        for n in first.tolist():
+            index = grouped[starts[numbers.searchsorted(n)]]
+            if t1[index] and evolve_count[index] > 0:
+                self.evolve_counts[str(n)] = int(evolve_count[index])
+        self.evolve_counts["total"] = sum(self.evolve_counts.values())
+        for n in first.tolist():
+            if self.family_table[n] == n:
+                self.unique_counts[str(n)] = sizes_by_number[n]
+        for n in first.tolist():
+            if str(n) in self.evolve_counts and str(n) in self.unique_counts:
+                self.needed_counts[str(n)] = self.evolve_counts[str(n)] - self.unique_counts[str(n)]
+
+    #indexes of one list, in the order PokemonData would list them
+    def indexes(self, key):
+        order = self.order[::-1] if key in ("extra", "transfer") else self.order
+        return order[self.masks[key][order]]
+
+    def ids(self, key):
+        return self.id[self.indexes(key)]
+
+    def summary(self):
+        summary = dict((key, self.ids(key).tolist()) for key in LISTS)
+        summary["evolve_counts"] = self.evolve_counts
+        summary["unique_counts"] = self.unique_counts
+        summary["needed_counts"] = self.needed_counts
+        return summary
+
+#ids of every list plus the counts, with numpy if there is numpy
+#the optimizer (config "optimize") only runs in PokemonData
+def summarize(pokemon, candies, pokedex, family=None, cost=None, config=None, levels=None):
+    optimize = config.get("optimize") if isinstance(config, dict) else getattr(config, "optimize", False)
+    if np is not None and not optimize:
+        return PokemonColumns(pokemon, candies, pokedex, family, cost, config, levels).summary()
+    data = PokemonData(pokemon, candies, pokedex, family, cost, config, levels=levels)
+    summary = dict((key, [p.id for p in data[key]]) for key in LISTS)
+    summary["evolve_counts"] = data["evolve_counts"]
+    summary["unique_counts"] = data["unique_counts"]
+    summary["needed_counts"] = data["needed_counts"]
+    return summary
@@ -1,184 +1,447 @@
 import time
+from collections import OrderedDict
+
+from species import Species
+from levels import load_projection
+from ivs import infer
+from optimizer import plan_inventory
+
+class Pokemon(object):
+    #A compact record for one pokemon
+    #cost is only set for pokemon that can evolve
+    #level is None without a cp_multiplier, perfection is the IV without base stats (see levels.py)
+    #iv_min and iv_max are the IV when it is known, the range it can be in when it was worked out (see ivs.py)
+    #attack, defense and stamina are None when more than one combination fits
+    __slots__ = ("id", "number", "name", "family", "stamina", "attack", "defense", "iv", "iv_min", "iv_max", "cp", "cost", "candy", "level", "perfection")
+
+    @property
+    def ivPercent(self):
+        return self.iv/100
+
+#a Pokemon's attack, defense or stamina for display
+#IVs worked out from the CP can leave a stat open
+def stat_text(value):
+    return '?' if value is None else str(value)
+
+#config can be a dict (gui) or an argparse namespace (cli)
+#options added later take a default, older configs don't have them
+def get_config(config, key, *default):
+    if isinstance(config, dict):
+        return config[key] if key in config or not default else default[0]
+    return getattr(config, key, *default)
+
+#what "all" and every species group are sorted by, config "rank"
+#perfection is the CP a pokemon would have at max level against a perfect one of its species
+RANKS = {
+    "iv": lambda x: x.iv,
+    "perfection": lambda x: x.perfection
+}
+
+#the lists set_lists builds, and whether they are in ascending rank
+LISTS = (("best", False), ("extra", True), ("transfer", True), ("other", False), ("evolve", False))
 
 class PokemonData(dict):
     #A dictionary for all of the key information used in pokeIV
-    def __init__(self, pokemon, candies, pokedex, family, cost, config, session):
-        self.init_all(candies, pokedex, family, cost, config, session, pokemon)
+    #levels is a levels.Levels, the built in table if not given
+    def __init__(self, pokemon, candies, pokedex, family=None, cost=None, config=None, session=None, levels=None):
+        self.levels = levels
+        self.init_all(candies, Species.coerce(pokedex, family, cost), config, session, pokemon)
     
     #takes a list of pokemon from the API, 
     #a candies dict from the API,
-    #a pokedex dict {number,name}, 
-    #a family dict {number, family}, 
-    #an evolve cost dict {number, cost},
-    #and the configuration options
-    def init_all(self, candies, pokedex, family, cost, config, session=None, pokemon=None):
-        self["candy"] = candies
-        self["pokedex"] = pokedex
-        self["family"] = family
-        self["cost"] = cost
+    #the species tables (a Species, or the pokedex, family and cost dicts),
+    #and the configuration options (a dict or an argparse namespace)
+    def init_all(self, candies, species, config, session=None, pokemon=None):
+        #own copy, candy is adjusted locally after each action
+        self["candy"] = dict(candies)
+        self.species = species
+        self.projection = load_projection(species, self.levels)
+        self["pokedex"] = species.pokedex
         self["config"] = config
+        self.rank = RANKS[self.get_config("rank", None) or "iv"]
         if pokemon is not None:
             self.set_all(pokemon)
+        else:
+            self["all"].sort(key=self.rank, reverse=True)
         if session is not None:
             self["session"] = session
-        if self["config"]["hard_minimum"]:
-            self.set_top()
-        else:
-            self.set_best()
-        self.set_evolve_counts()
-        self.set_unique_counts()
-        self.set_needed_counts()
-        self["extra"] = sorted(list(set(self["all"]) - set(self["best"])), key=lambda x: x.iv)
-        self.set_transfer()
-        self["other"] = sorted(list(set(self["extra"]) - set(self["transfer"])), key=lambda x: x.iv, reverse=True)
-        self.set_evolve()
-    
+        self.set_groups()
+        self.classify()
+
     def set_all(self, pokemon):
         self["all"] = []
-        
+        self.index = dict()
+
         for p in pokemon:
-            pok = type('',(),{})
-            pok.id = p.id
-            pok.number = p.pokemon_id
-            pok.name = self["pokedex"][str(pok.number)]
-            pok.family = self["family"][str(pok.number)]
-            pok.stamina = int(p.individual_stamina) if hasattr(p,"individual_stamina") else 0
-            pok.attack = int(p.individual_attack) if hasattr(p,"individual_attack") else 0
-            pok.defense = int(p.individual_defense) if hasattr(p,"individual_defense") else 0
-            pok.iv = ((pok.stamina + pok.attack + pok.defense) / float(45))*100
-            pok.ivPercent = pok.iv/100
-            pok.cp = p.cp
-            if int(self["cost"][str(pok.number)]) > 0:
-                pok.cost = int(self["cost"][str(pok.number)])
-            pok.candy = self["candy"][int(pok.family)]
+            pok = self.make_pokemon(p)
             self["all"].append(pok)
+            self.index[pok.id] = pok
+
+        #the only full sort, everything else keeps this order
+        self["all"].sort(key=self.rank, reverse=True)
 
-        self["all"].sort(key=lambda x: x.iv, reverse=True)
+    #takes a pokemon from the API
+    def make_pokemon(self, p):
+        pok = Pokemon()
+        pok.id = p.id
+        pok.number = p.pokemon_id
+        pok.name = self.species.names[pok.number]
+        pok.family = self.species.family[pok.number]
+        pok.stamina = int(p.individual_stamina)
+        pok.attack = int(p.individual_attack)
+        pok.defense = int(p.individual_defense)
+        pok.iv = ((pok.stamina + pok.attack + pok.defense) / float(45))*100
+        pok.iv_min = pok.iv_max = pok.iv
+        pok.cp = p.cp
+        pok.level = self.projection.levels.level(p.cp_multiplier + p.additional_cp_multiplier)
+        pok.perfection = self.projection.perfection(pok.number, pok.attack, pok.defense, pok.stamina)
+        #protobuf fields are never missing, IVs the server didn't send are all 0
+        if not (pok.stamina or pok.attack or pok.defense):
+            self.infer_ivs(pok, p)
+        if pok.perfection is None:
+            pok.perfection = pok.iv
+        if self.species.cost[pok.number] > 0:
+            pok.cost = self.species.cost[pok.number]
+        pok.candy = self["candy"][pok.family]
+        return pok
 
-    def set_best(self):
-        self["best"] = []
+    #works the IVs out from the CP and HP at the pokemon's level
+    #the IV is the average of every combination that fits, with their range
+    def infer_ivs(self, pok, p):
+        inferred = infer(self.projection, pok.number, p.cp, p.stamina_max, pok.level)
+        if not inferred:
+            return
+        if inferred.exact:
+            pok.attack, pok.defense, pok.stamina = inferred.exact
+        else:
+            pok.attack = pok.defense = pok.stamina = None
+        pok.iv, pok.iv_min, pok.iv_max = inferred.expected, inferred.min, inferred.max
+        pok.perfection = inferred.perfection
 
+    #hash index of species number -> pokemon, highest ranked first
+    def set_groups(self):
+        self.groups = OrderedDict()
         for p in self["all"]:
-            #if there isn't a pokemon in best with the same number (name) as this one, add it
-            if not any(x.number == p.number for x in self["best"]):
-                self["best"].append(p)
-            #if it passes the minimum iv test
-            elif p.iv >= float(self["config"]["minimumIV"]):
-                self["best"].append(p)
-            #if cp_override is set, check CP
-            elif self["config"]["cp_override"] is not None and int(self["config"]["cp_override"]) > 0 and int(p.cp) >= int(self["config"]["cp_override"]):
-                self["best"].append(p)
-
-        self["best"].sort(key=lambda x: x.iv, reverse=True)
-		
-    def set_transfer(self):
-        self["transfer"] = []
-        if self["extra"]:
-            used = dict()
-            for p in self["extra"]:
-                if self.black_listed(p) or not self.white_listed(p):
-                    continue
-                id = str(p.number)
-                used[id] = 0 if id not in used else used[id]
-                if self["config"]["force"] or id not in self["evolve_counts"] or used[id] < (self["unique_counts"][id] - self["evolve_counts"][id]):
-                    self["transfer"].append(p)
-                used[id] = used[id] + 1
-
-        self["transfer"].sort(key=lambda x: x.iv)
-
-    def set_evolve(self):
-        self["evolve"] = []
-        if any(self["evolve_counts"]):
-            count = dict()
-            for p in self["all"]:
-                if self.black_listed(p) or not self.white_listed(p):
-                    continue
-                id = str(p.number)
-                count[id] = 0 if id not in count else count[id]
-                if id in self["evolve_counts"] and count[id] < int(self["evolve_counts"][id]):
-                    self["evolve"].append(p)
-                    count[id] = count[id] + 1
-        self["evolve"].sort(key=lambda x: x.iv, reverse=True)
-        
-    def set_unique_counts(self):
+            if p.number in self.groups:
+                self.groups[p.number].append(p)
+            else:
+                self.groups[p.number] = [p]
+
+    #classifies every species group, then builds the lists from the groups
+    def classify(self):
+        self.results = dict()
+        for number in self.groups:
+            self.results[number] = self.classify_group(self.groups[number])
+        self.optimize()
+        self.set_lists()
+
+    #classifies only the species of one family again, candy is shared by the family
+    #the optimizer plans every family at once (max_evolutions is over all of them),
+    #without it only the family's pokemon move in the lists
+    #added are pokemon put in the groups since, they aren't in any list yet
+    def reclassify(self, family, added=()):
+        family = int(family)
+        before = dict()
+        for number in self.groups:
+            if self.groups[number][0].family == family:
+                before[number] = self.results.get(number)
+                self.results[number] = self.classify_group(self.groups[number])
+        if self.get_config("optimize", False):
+            self.optimize()
+            self.set_lists()
+        else:
+            self.update_lists(family, before, added)
+
+    #with the optimize option, evolutions and transfers are planned per family
+    #with the candy flow in mind: transfer refunds, the candy each evolution gives back,
+    #T2 evolutions, and max_evolutions over the whole inventory (see optimizer.py)
+    def optimize(self):
+        self.evolve_order = dict()
+        self["refunds"] = 0
+        if not self.get_config("optimize", False):
+            return
+
+        families = dict()
+        for number in self.groups:
+            group = self.groups[number]
+            first = group[0]
+            if first.family not in families:
+                families[first.family] = (self["candy"].get(first.family, 0), [], [])
+            if self.black_listed(first) or not self.white_listed(first):
+                continue
+            result = self.results[number]
+            families[first.family][2].extend(p for p in reversed(group) if p not in result["best"])
+            if hasattr(first, "cost"):
+                families[first.family][1].append((first.cost, group))
+
+        limit = self.get_config("max_evolutions", None)
+        plans = plan_inventory(families, int(limit) if limit else None)
+        for family, plan in plans.items():
+            self["refunds"] += plan["refunds"]
+            for i, p in enumerate(plan["evolve"]):
+                self.evolve_order[p] = i
+        for number in self.groups:
+            group = self.groups[number]
+            plan = plans[group[0].family]
+            result = self.results[number]
+            result["evolve"] = set(p for p in group if p in self.evolve_order)
+            result["transfer"] = set(p for p in plan["transfer"] if p.number == number)
+            result["evolve_count"] = len(result["evolve"]) or None
+
+    #works out best/transfer/evolve for one species in a single pass
+    #group is every pokemon of the species, highest ranked first
+    def classify_group(self, group):
+        result = {"best": set(), "transfer": set(), "evolve": set(), "evolve_count": None, "unique_count": None}
+        if not group:
+            return result
+        first = group[0]
+        listed = self.black_listed(first) or not self.white_listed(first)
+        minimum = float(self.get_config("minimumIV"))
+        override = self.get_config("cp_override")
+        override = int(override) if override is not None and int(override) > 0 else None
+
+        #best: highest of each species, anything that may be above minimumIV, or above cp_override
+        #with hard_minimum only minimumIV counts
+        for i, p in enumerate(group):
+            if p.iv_max >= minimum:
+                result["best"].add(p)
+            elif self.get_config("hard_minimum"):
+                continue
+            elif i == 0 or (override is not None and int(p.cp) >= override):
+                result["best"].add(p)
+
+        #T1 pokemon: how many evolutions the candy allows, and how many there are
+        if first.number == first.family:
+            result["unique_count"] = len(group)
+            if not listed and hasattr(first, 'cost') and int(first.candy/first.cost) > 0:
+                result["evolve_count"] = int(first.candy/first.cost)
+
+        if listed:
+            return result
+
+        #evolve the highest IVs
+        if result["evolve_count"] is not None:
+            result["evolve"].update(group[:result["evolve_count"]])
+
+        #transfer the lowest extras, keeping enough to evolve
+        extra = [p for p in reversed(group) if p not in result["best"]]
+        if self.get_config("force") or result["evolve_count"] is None:
+            result["transfer"].update(extra)
+        else:
+            result["transfer"].update(extra[:max(0, result["unique_count"] - result["evolve_count"])])
+        return result
+
+    #builds the lists and counts from the group results, without sorting
+    def set_lists(self):
+        results = self.results
+        self["evolve_counts"] = dict()
         self["unique_counts"] = dict()
-        for p in self["all"]:
-            if (str(p.number) == str(p.family)):
-                if str(p.number) in self["unique_counts"]:
-                    self["unique_counts"][str(p.number)] = self["unique_counts"][str(p.number)] + 1
-                else:
-                    self["unique_counts"][str(p.number)] = 1
+        self["needed_counts"] = dict()
+        total = 0
+        for number in self.groups:
+            result = results[number]
+            if result["evolve_count"] is not None:
+                self["evolve_counts"][str(number)] = result["evolve_count"]
+                total += result["evolve_count"]
+        self["evolve_counts"]["total"] = total
+        for number in self.groups:
+            result = results[number]
+            if result["unique_count"] is not None:
+                self["unique_counts"][str(number)] = result["unique_count"]
+        for number in self.groups:
+            result = results[number]
+            if result["evolve_count"] is not None and result["unique_count"] is not None:
+                self["needed_counts"][str(number)] = result["evolve_count"] - result["unique_count"]
+
+        #"all" is sorted by rank descending, reversed gives ascending
+        self["best"] = [p for p in self["all"] if p in results[p.number]["best"]]
+        self["extra"] = [p for p in reversed(self["all"]) if p not in results[p.number]["best"]]
+        self["transfer"] = [p for p in self["extra"] if p in results[p.number]["transfer"]]
+        self["other"] = [p for p in self["all"] if p not in results[p.number]["best"] and p not in results[p.number]["transfer"]]
+        self["evolve"] = [p for p in self["all"] if p in results[p.number]["evolve"]]
+        #cheapest first within each family, so the candy lasts
+        if self.evolve_order:
+            self["evolve"].sort(key=self.evolve_order.get)
+
+    #set_lists for the species of one family, the rest of the lists stay as they are
+    #before has the family's results from the last time, only pokemon that changed lists move
+    def update_lists(self, family, before, added=()):
+        numbers = [n for n, f in enumerate(self.species.family) if f == family]
+        total = self["evolve_counts"]["total"]
+        for number in numbers:
+            total -= self["evolve_counts"].get(str(number), 0)
+            for key in ("evolve_counts", "unique_counts", "needed_counts"):
+                self[key].pop(str(number), None)
+            if number not in self.groups:
+                continue
+            result = self.results[number]
+            if result["evolve_count"] is not None:
+                self["evolve_counts"][str(number)] = result["evolve_count"]
+                total += result["evolve_count"]
+            if result["unique_count"] is not None:
+                self["unique_counts"][str(number)] = result["unique_count"]
+            if result["evolve_count"] is not None and result["unique_count"] is not None:
+                self["needed_counts"][str(number)] = result["evolve_count"] - result["unique_count"]
+        self["evolve_counts"]["total"] = total
+
+        for number in numbers:
+            for p in self.groups.get(number, []):
+                now = self.lists_of(self.results[number], p)
+                last = self.lists_of(None if p in added else before.get(number), p)
+                for key, ascending in LISTS:
+                    if now[key] != last[key]:
+                        self.place(key, ascending, p, now[key])
+
+    #which of the lists a pokemon goes in, none without a result (a pokemon just added)
+    @staticmethod
+    def lists_of(result, p):
+        if result is None:
+            return dict((key, False) for key, ascending in LISTS)
+        best = p in result["best"]
+        transfer = not best and p in result["transfer"]
+        return {"best": best, "extra": not best, "transfer": transfer,
+                "other": not best and not transfer, "evolve": p in result["evolve"]}
+
+    def get_config(self, key, *default):
+        return get_config(self["config"], key, *default)
 
     #returns true if pokemon is black listed, false otherwise
     def black_listed(self,pokemon):
-        if self["config"]["black_list"] is not None and (str(pokemon.number) in self["config"]["black_list"] or pokemon.name.lower() in self["config"]["black_list"]):
+        black_list = self.get_config("black_list")
+        if black_list is not None and (str(pokemon.number) in black_list or pokemon.name.lower() in black_list):
             return True
         else:
             return False
-            
+
     #returns true if pokemon is white listed or if white list does not exist, false otherwse
     def white_listed(self,pokemon):
-        if self["config"]["white_list"] is None or str(pokemon.number) in self["config"]["white_list"] or pokemon.name.lower() in self["config"]["white_list"]:
+        white_list = self.get_config("white_list")
+        if white_list is None or str(pokemon.number) in white_list or pokemon.name.lower() in white_list:
             return True
         else:
             return False
-            
-    def set_evolve_counts(self):
-        self["evolve_counts"] = dict()
-        total = 0
 
-        for p in self["all"]:
-            if self.black_listed(p) or not self.white_listed(p):
-                continue
-            if str(p.number) == str(p.family) and str(p.number) not in self["evolve_counts"] and hasattr(p,'cost'):
-                if int(p.candy/p.cost) > 0:
-                    self["evolve_counts"][str(p.number)] = int(p.candy/p.cost)
-                    total += int(p.candy/p.cost)
-        self["evolve_counts"]["total"] = total
+    def get_pokemon_from_id(self, id):
+        return self.index.get(int(id))
 
-    def set_needed_counts(self):
-        self["needed_counts"] = dict()
-        for p in self["all"]:
-            if str(p.number) in self["evolve_counts"] and str(p.number) in self["unique_counts"]:
-                self["needed_counts"][str(p.number)] = self["evolve_counts"][str(p.number)] - self["unique_counts"][str(p.number)]
+    #inserts a pokemon from the API, keeping "all" and its group sorted by rank
+    def add_pokemon(self, pokemon):
+        p = self.make_pokemon(pokemon)
+        self.index[p.id] = p
+        self.insert_sorted(self["all"], p, self.rank)
+        if p.number in self.groups:
+            self.insert_sorted(self.groups[p.number], p, self.rank)
+        else:
+            self.groups[p.number] = [p]
+        return p
 
-    def set_top(self):
-        self["best"] = []
+    #after any pokemon ranked the same, like a full sort would
+    @staticmethod
+    def insert_sorted(pokemon, p, rank=lambda x: x.iv):
+        lo, hi = 0, len(pokemon)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rank(pokemon[mid]) < rank(p):
+                hi = mid
+            else:
+                lo = mid + 1
+        pokemon.insert(lo, p)
 
-        for p in self["all"]:
-            #if it passes the minimum iv test
-            if p.iv >= float(self["config"]["minimumIV"]):			
-                self["best"].append(p)
+    #start and end of the pokemon ranked the same as p, in a list sorted by rank
+    @staticmethod
+    def find_ranked(pokemon, p, rank=lambda x: x.iv, ascending=False):
+        lo, hi = 0, len(pokemon)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (rank(pokemon[mid]) < rank(p)) if ascending else (rank(pokemon[mid]) > rank(p)):
+                lo = mid + 1
+            else:
+                hi = mid
+        end = lo
+        while end < len(pokemon) and rank(pokemon[end]) == rank(p):
+            end += 1
+        return lo, end
+
+    #puts p in or takes it out of one of the lists set_lists builds,
+    #pokemon ranked the same keep their order in "all" (reversed in an ascending list)
+    def place(self, key, ascending, p, member):
+        pokemon = self[key]
+        lo, hi = self.find_ranked(pokemon, p, self.rank, ascending)
+        ties = pokemon[lo:hi]
+        if p in ties:
+            if not member:
+                del pokemon[lo + ties.index(p)]
+            return
+        if not member:
+            return
+        start, end = self.find_ranked(self["all"], p, self.rank)
+        order = dict((id(q), i) for i, q in enumerate(self["all"][start:end]))
+        after = order.get(id(p), 0)
+        for i, q in enumerate(ties):
+            if (order.get(id(q), 0) < after) if ascending else (order.get(id(q), 0) > after):
+                pokemon.insert(lo + i, p)
+                return
+        pokemon.insert(hi, p)
+
+    #returns false if the pokemon wasn't there
+    def remove_pokemon(self, p):
+        if p not in self.groups.get(p.number, []):
+            return False
+        self["all"].remove(p)
+        self.index.pop(p.id, None)
+        self.groups[p.number].remove(p)
+        if not self.groups[p.number]:
+            del self.groups[p.number]
+            del self.results[p.number]
+        for key, ascending in LISTS:
+            self.place(key, ascending, p, False)
+        return True
+
+    def add_candy(self, family, candy):
+        self["candy"][int(family)] = self["candy"].get(int(family), 0) + candy
+        for number in self.groups:
+            if self.groups[number][0].family == int(family):
+                for p in self.groups[number]:
+                    p.candy = self["candy"][int(family)]
 
-        self["best"].sort(key=lambda x: x.iv, reverse=True)
-    
-    def get_pokemon_from_id(self, id):
-        for p in self["all"]:
-            if int(p.id) == int(id):
-                return p
-        return None
-    
     def transfer_pokemon(self, pokemon):
         if isinstance(pokemon, str) or isinstance(pokemon, int):
-            p = self.get_pokemon_from_id(int(pokemon))
-            if p is not None:
-                self["session"].releasePokemon(p)
-        else:
-            self["session"].releasePokemon(pokemon)
-        self.update()
+            pokemon = self.get_pokemon_from_id(int(pokemon))
+            if pokemon is None:
+                self.update(True)
+                return
+        result = self["session"].releasePokemon(pokemon)
+
+        #apply the result locally, resync if we don't agree with the server
+        if result.result != result.SUCCESS or not self.remove_pokemon(pokemon):
+            self.update(True)
+            return
+        self.add_candy(pokemon.family, result.candy_awarded)
+        self.reclassify(pokemon.family)
 
     def evolve_pokemon(self, pokemon):
         if isinstance(pokemon, str) or isinstance(pokemon, int):
-            p = self.get_pokemon_from_id(int(pokemon))
-            if p is not None:
-                self["session"].evolvePokemon(p)
-        else:
-            self["session"].evolvePokemon(pokemon)
-        self.update()
-        
-    def update(self):
+            pokemon = self.get_pokemon_from_id(int(pokemon))
+            if pokemon is None:
+                self.update(True)
+                return
+        result = self["session"].evolvePokemon(pokemon)
+
+        #apply the result locally, resync if we don't agree with the server
+        if result.result != result.SUCCESS or not self.remove_pokemon(pokemon):
+            self.update(True)
+            return
+        self.add_candy(pokemon.family, result.candy_awarded - getattr(pokemon, "cost", 0))
+        evolved = self.add_pokemon(result.evolved_pokemon_data)
+        self.reclassify(pokemon.family, (evolved,))
+
+    #pulls the inventory again and classifies from scratch
+    #full drops the session's inventory as well
+    def update(self, full=False):
+        if full:
+            self["session"].resetInventory()
         inventory = self["session"].getInventory()
-        self.init_all(inventory["candies"],self["pokedex"],self["family"], self["cost"],self["config"],self["session"],inventory["party"])
-        
+        self.init_all(inventory["candies"],self.species,self["config"],self["session"],inventory["party"])
+
     def reconfigure(self, config, session=None):
-        self.init_all(self["candy"],self["pokedex"],self["family"], self["cost"],config, session)
\ No newline at end of file
+        self.init_all(self["candy"],self.species,config, session)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import time
+import heapq
+import random
+
+class TokenBucket(object):
+    #rate limit of one action every interval seconds, up to burst at once
+    def __init__(self, interval, burst=1, now=0.0):
+        self.interval = float(interval)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        if self.interval <= 0:
+            self.tokens = float(self.burst)
+        else:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+
+    #seconds until an action may run
+    def wait_time(self, now):
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.interval
+
+    def take(self, now):
+        self.refill(now)
+        self.tokens -= 1
+
+class ActionQueue(object):
+    #pending actions of one type, lowest priority number first, then in order
+    def __init__(self, name, interval, burst=1, now=0.0):
+        self.name = name
+        self.bucket = TokenBucket(interval, burst, now)
+        self.interval = float(interval)
+        self.actions = []
+        self.count = 0
+        self.delay = 0.0
+        self.failures = 0
+
+    def __len__(self):
+        return len(self.actions)
+
+    def set_interval(self, interval):
+        self.interval = float(interval)
+        self.bucket.interval = float(interval)
+
+    def push(self, action, priority):
+        heapq.heappush(self.actions, (priority, self.count, action))
+        self.count += 1
+
+    def pop(self):
+        return heapq.heappop(self.actions)[2]
+
+class Scheduler(object):
+    #Runs queued actions, every action type at its own rate
+    #the waits of different queues overlap, the actions themselves never do,
+    #so nothing here needs the session to be thread safe
+    #jitter adds up to that fraction of the interval to every wait
+    #an action that returns False (a failed request) doubles its queue's wait, up to max_backoff times
+    def __init__(self, jitter=0.0, max_backoff=3, seed=None, clock=time.time, sleep=time.sleep):
+        self.queues = {}
+        self.jitter = float(jitter)
+        self.max_backoff = max_backoff
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self.running = False
+
+    def add_queue(self, name, interval, burst=1):
+        self.queues[name] = ActionQueue(name, interval, burst, self.clock())
+        return self.queues[name]
+
+    def submit(self, name, action, priority=0):
+        self.queues[name].push(action, priority)
+
+    def pending(self, name=None):
+        if name is not None:
+            return len(self.queues[name])
+        return sum(len(q) for q in self.queues.values())
+
+    def clear(self, name=None):
+        for queue in self.queues.values():
+            if name is None or queue.name == name:
+                del queue.actions[:]
+
+    #seconds until the queue's next action may run, None if it has nothing
+    def wait_time(self, queue, now):
+        if not queue.actions:
+            return None
+        return max(queue.bucket.wait_time(now), queue.delay - now)
+
+    #runs every action that is due, returns the seconds until the next one (None when idle)
+    def step(self):
+        while True:
+            now = self.clock()
+            waits = [(self.wait_time(q, now), q.name) for q in self.queues.values() if q.actions]
+            if not waits:
+                return None
+            wait, name = min(waits)
+            if wait > 0:
+                return wait
+            self.run_next(self.queues[name], now)
+
+    def run_next(self, queue, now):
+        queue.bucket.take(now)
+        action = queue.pop()
+        ok = action()
+
+        #back off after failures, recover one step per success
+        if ok is False:
+            queue.failures = min(queue.failures + 1, self.max_backoff)
+        elif queue.failures:
+            queue.failures -= 1
+        backoff = queue.interval * (2 ** queue.failures - 1) if queue.failures else 0.0
+        jitter = self.random.uniform(0, self.jitter * queue.interval) if self.jitter else 0.0
+        now = self.clock()
+        queue.delay = now + queue.bucket.wait_time(now) + backoff + jitter
+
+    #blocks until every queue is empty
+    #or, with until (a clock time), until the next action would start after it,
+    #whatever is left stays queued
+    def run(self, until=None):
+        self.running = True
+        try:
+            while self.running and (until is None or self.clock() <= until):
+                wait = self.step()
+                if wait is None or (until is not None and self.clock() + wait > until):
+                    break
+                self.sleep(wait)
+        finally:
+            self.running = False
+
+    def stop(self):
+        self.running = False
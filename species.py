@@ -0,0 +1,236 @@
+import os
+import csv
+import marshal
+
+ROOT = os.path.dirname(os.path.realpath(__file__))
+TABLES = ("names.tsv", "families.tsv", "evolves.tsv")
+
+#compiled tables live with the other caches, relative to the working directory
+#the ones built from item templates go next to the templates, per settings hash
+CACHE_FILE = os.path.join("cache", "species.bin")
+TEMPLATES_CACHE_FILE = "species_{0}.bin"
+CACHE_VERSION = 2
+
+#order of the lists in the compiled file
+FIELDS = ("names", "family", "cost", "children", "parent", "attack", "defense", "stamina")
+
+class Species(object):
+    #Species metadata as lists indexed by pokemon number, 0 is unused
+    #names[n], family[n] (number of the T1), cost[n] (candy to evolve, 0 if it can't),
+    #children[n] (numbers it evolves into) and parent[n] (0 for a T1)
+    #attack/defense/stamina[n] are base stats, 0 unless read from the item templates
+    def __init__(self, names, family, cost, children=None, parent=None, attack=None, defense=None, stamina=None):
+        self.names = names
+        self.family = family
+        self.cost = cost
+        self.children = children if children is not None else find_children(family, cost)
+        self.parent = parent if parent is not None else find_parents(self.children)
+        self.attack = attack if attack is not None else [0] * len(names)
+        self.defense = defense if defense is not None else [0] * len(names)
+        self.stamina = stamina if stamina is not None else [0] * len(names)
+        self._pokedex = None
+        #levels.Projection by levels and max level, see levels.load_projection
+        self.projections = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, number):
+        return 0 < number < len(self.names) and self.names[number] is not None
+
+    #the string keyed pokedex the gui and the printouts look names up in
+    @property
+    def pokedex(self):
+        if self._pokedex is None:
+            self._pokedex = dict((str(n), name) for n, name in enumerate(self.names) if name is not None)
+        return self._pokedex
+
+    #from the string keyed dicts the tsv files used to be read into
+    @classmethod
+    def from_dicts(cls, pokedex, family, cost):
+        size = max(int(k) for k in pokedex) + 1
+        names = [None] * size
+        families = [0] * size
+        costs = [0] * size
+        for k in pokedex:
+            names[int(k)] = pokedex[k]
+        for k in family:
+            if int(k) < size:
+                families[int(k)] = int(family[k])
+        for k in cost:
+            if int(k) < size:
+                costs[int(k)] = int(cost[k])
+        return cls(names, families, costs)
+
+    #from the PokemonSettings of a DownloadItemTemplatesResponse
+    #names come from the pokedex dict where it has them, else from the PokemonId enum
+    @classmethod
+    def from_templates(cls, templates, pokedex=None):
+        settings = [t.pokemon_settings for t in templates.item_templates if t.HasField("pokemon_settings")]
+        if not settings:
+            return None
+        size = max(s.pokemon_id for s in settings) + 1
+        species = cls([None] * size, [0] * size, [0] * size, [()] * size, [0] * size)
+        for s in settings:
+            n = s.pokemon_id
+            species.names[n] = (pokedex or {}).get(str(n)) or enum_name(s, "pokemon_id")
+            species.family[n] = s.family_id
+            species.cost[n] = s.candy_to_evolve
+            species.children[n] = tuple(s.evolution_ids)
+            species.parent[n] = s.parent_pokemon_id
+            species.attack[n] = s.stats.base_attack
+            species.defense[n] = s.stats.base_defense
+            species.stamina[n] = s.stats.base_stamina
+        return species
+
+    #whatever PokemonData was given: a Species or the three dicts
+    @classmethod
+    def coerce(cls, pokedex, family=None, cost=None):
+        if isinstance(pokedex, Species):
+            return pokedex
+        return cls.from_dicts(pokedex, family, cost)
+
+#chains are numbered in order, 1 -> 2 -> 3
+#branching evolutions (eevee) are siblings that all cost nothing
+def find_children(family, cost):
+    children = [()] * len(family)
+    for number in range(1, len(family)):
+        if not cost[number]:
+            continue
+        following = number + 1
+        if following < len(cost) and cost[following]:
+            children[number] = (following,)
+            continue
+        siblings = []
+        while following < len(family) and family[following] == family[number] and not cost[following]:
+            siblings.append(following)
+            following += 1
+        children[number] = tuple(siblings)
+    return children
+
+def find_parents(children):
+    parent = [0] * len(children)
+    for number, evolutions in enumerate(children):
+        for child in evolutions:
+            if child < len(parent):
+                parent[child] = number
+    return parent
+
+#BULBASAUR -> Bulbasaur, NIDORAN_FEMALE -> Nidoran Female
+def enum_name(message, field):
+    enum = message.DESCRIPTOR.fields_by_name[field].enum_type
+    value = enum.values_by_number.get(getattr(message, field))
+    if value is None:
+        return str(getattr(message, field))
+    return value.name.replace("_", " ").title()
+
+def read_tables(path=ROOT):
+    tables = []
+    for name in TABLES:
+        with open(os.path.join(path, name)) as f:
+            f.readline()
+            tables.append(dict(csv.reader(f, delimiter='\t')))
+    return tables
+
+#just the names, the templates don't have them
+def read_names(path=ROOT):
+    try:
+        with open(os.path.join(path, TABLES[0])) as f:
+            f.readline()
+            return dict(csv.reader(f, delimiter='\t'))
+    except (IOError, OSError):
+        return {}
+
+#changes to any tsv file make a new key
+def tables_key(path=ROOT):
+    key = [CACHE_VERSION]
+    for name in TABLES:
+        key.extend(table_key(path, name))
+    return tuple(key)
+
+def table_key(path, name):
+    stat = os.stat(os.path.join(path, name))
+    return [name, int(stat.st_mtime * 1000), stat.st_size]
+
+#the names in the templates come from names.tsv, which may be missing
+def names_key(path=ROOT):
+    try:
+        return tuple(table_key(path, TABLES[0]))
+    except (IOError, OSError):
+        return None
+
+#the cache module is in pogo, which the scripts put on the path after importing this
+#(pokeIV, pokeIV-gui and the benches), so it is imported when the tables are written
+def write_cache(species, key, cache_file):
+    from cache import writeFile
+    writeFile(cache_file, marshal.dumps((key,) + tuple(getattr(species, field) for field in FIELDS)))
+
+def read_cache(key, cache_file):
+    try:
+        with open(cache_file, "rb") as f:
+            cached = marshal.load(f)
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(cached, tuple) or len(cached) != len(FIELDS) + 1 or cached[0] != key:
+        return None
+    return Species(*cached[1:])
+
+#loaded once per process, from the compiled cache while its source is unchanged
+_loaded = {}
+
+def load_cached(key, cache_file, build):
+    if _loaded.get(cache_file, (None,))[0] == key:
+        return _loaded[cache_file][1]
+
+    species = read_cache(key, cache_file) if cache_file else None
+    if species is None:
+        species = build()
+        if species is None:
+            return None
+        if cache_file:
+            try:
+                write_cache(species, key, cache_file)
+            #without pogo on the path the tables are only kept for this process
+            except (IOError, OSError, ImportError):
+                pass
+    _loaded[cache_file] = (key, species)
+    return species
+
+#settings is a SettingsCache, the tables come from its item templates when it has them
+#and from the tsv files otherwise
+def load_species(path=ROOT, cache_file=CACHE_FILE, settings=None):
+    if settings is not None and settings.hash:
+        species = load_cached(
+            (CACHE_VERSION, "templates", settings.hash, names_key(path)),
+            os.path.join(settings.path, TEMPLATES_CACHE_FILE.format(settings.hash)) if cache_file else None,
+            lambda: settings.templates and Species.from_templates(settings.templates, read_names(path))
+        )
+        if species is not None:
+            return species
+
+    return load_cached(
+        tables_key(path),
+        cache_file,
+        lambda: Species.from_dicts(*read_tables(path))
+    )
+
+#compiles the item templates in a settings cache directory
+def main():
+    import sys
+    import argparse
+    sys.path.insert(0, os.path.join(ROOT, "pogo"))
+    import POGOProtos
+    from cache import SettingsCache, CACHE_DIR
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--cache", help="directory with the downloaded item templates", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    settings = SettingsCache(args.cache)
+    if settings.templates is None:
+        sys.exit("no item templates in {0} for hash '{1}'".format(args.cache, settings.hash))
+    species = load_species(settings=settings)
+    print("{0} species from the templates for hash {1}".format(len([n for n in species.names if n]), settings.hash))
+
+if __name__ == "__main__":
+    main()